@@ -0,0 +1,70 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from api.tokens import check_not_revoked
+from api.tokencache import verified_tokens
+
+
+def get_raw_token(request):
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0] != 'Bearer':
+        return None
+    return parts[1]
+
+
+def authenticate_request(request, raw_token=None, token_class=AccessToken):
+    """
+    Decode and verify the bearer token of a Django request at most once.
+
+    The validated token is stored on the request as ``jwt_token`` and the
+    user id claim as ``jwt_user_id``; both are None when the header is missing
+    or the token is invalid, in which case ``jwt_error`` holds the reason.
+    A token already verified by an earlier request is taken from the
+    verified token cache instead of being decoded again.
+
+    A view that accepts a token sent some other way passes it as
+    ``raw_token``, with the ``token_class`` to verify it as; the result
+    replaces that of the header.
+    """
+    if raw_token is None:
+        if hasattr(request, 'jwt_token'):
+            return request.jwt_token
+        raw_token = get_raw_token(request)
+
+    request.jwt_token = None
+    request.jwt_user_id = None
+    request.jwt_error = None
+    if raw_token is not None:
+        # Only access tokens are cached, so a token of another type is never
+        # handed out from the cache as one.
+        cached = token_class is AccessToken
+        try:
+            token = verified_tokens.get(raw_token) if cached else None
+            if token is None:
+                token = token_class(raw_token)
+                if cached:
+                    verified_tokens.put(raw_token, token)
+            check_not_revoked(token)
+            request.jwt_token = token
+            request.jwt_user_id = token.get('user_id')
+        except TokenError as e:
+            request.jwt_error = e
+
+    return request.jwt_token
+
+
+class RequestTokenAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that reuses the token already verified by the
+    ``authenticate_token`` middleware instead of decoding it again.
+    """
+
+    def authenticate(self, request):
+        django_request = request._request
+        validated_token = authenticate_request(django_request)
+        if validated_token is None:
+            if django_request.jwt_error is not None:
+                raise InvalidToken(django_request.jwt_error.args[0])
+            return super().authenticate(request)
+
+        return self.get_user(validated_token), validated_token
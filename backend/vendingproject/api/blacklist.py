@@ -0,0 +1,193 @@
+import hashlib
+import math
+import struct
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+BLACKLIST_VERSION_KEY = 'token_blacklist_version'
+# blake2b digests are at most 64 bytes, 16 words.
+MAX_HASHES = 16
+
+
+class BloomFilter:
+    """
+    A set of strings that may answer "present" for a string never added,
+    with probability about ``false_positive_rate`` at ``capacity`` entries,
+    but never answers "absent" for one that was.
+    """
+
+    def __init__(self, capacity, false_positive_rate):
+        self.capacity = max(1, capacity)
+        self.false_positive_rate = false_positive_rate
+        self.bits = max(8, math.ceil(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = min(MAX_HASHES, max(1, round(self.bits / self.capacity * math.log(2))))
+        self.words = struct.Struct(f'<{self.hashes}I')
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def positions(self, value):
+        # One 32-bit word of a single digest per hash function.
+        digest = hashlib.blake2b(value.encode(), digest_size=4 * self.hashes).digest()
+        return [word % self.bits for word in self.words.unpack(digest)]
+
+    def add(self, value):
+        array = self.array
+        for position in self.positions(value):
+            array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        array = self.array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+
+class BlacklistFilter:
+    """
+    The JTIs of blacklisted refresh tokens, mirrored in a per-worker Bloom
+    filter so that a token that is not revoked is let through without
+    querying BlacklistedToken. Only a possible match goes to the database.
+
+    Loading the filter reads every blacklisted JTI, which takes minutes at
+    millions of rows, so start() loads it in a background thread when the
+    server starts; until it is loaded every check goes to the database. It
+    is then updated by every blacklist write in this process. Writes in
+    other workers bump BLACKLIST_VERSION_KEY in the shared ``revocations``
+    cache when they commit; a worker that sees a new version loads the rows
+    past the last id it has read. This relies on ids being committed in
+    increasing order, which holds on SQLite where writes are serialized. A
+    filter that outgrows its capacity is rebuilt twice as big in the
+    background, and the old one answers meanwhile.
+    """
+
+    def __init__(self, capacity=100000, false_positive_rate=0.001):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self._lock = threading.Lock()
+        self._filter = None
+        self._version = None
+        self._last_id = 0
+        self._started = False
+        self._loader = None
+        # JTIs recorded while a new filter is being loaded, None otherwise.
+        self._recorded = None
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'TOKEN_BLACKLIST_FILTER', {})
+        return cls(
+            capacity=config.get('CAPACITY', 100000),
+            false_positive_rate=config.get('FALSE_POSITIVE_RATE', 0.001),
+        )
+
+    def start(self):
+        """Load the filter in a background thread, unless it is already loading."""
+        with self._lock:
+            self._started = True
+            # A worker forked from the process that started loading has no loader thread.
+            if self._loader is None or not self._loader.is_alive():
+                self._start_loader()
+
+    def might_contain(self, jti):
+        bloom = self._filter
+        if bloom is None:
+            if self._started and not self._loader.is_alive():
+                self.start()
+            return True
+
+        version = get_blacklist_version()
+        if version != self._version:
+            # Never wait for another thread: the database can answer instead.
+            if not self._lock.acquire(blocking=False):
+                return True
+            try:
+                self._catch_up(version)
+                bloom = self._filter
+            finally:
+                self._lock.release()
+        return jti in bloom
+
+    def record(self, jtis):
+        """Add JTIs being blacklisted now, and tell other workers once they are committed."""
+        with self._lock:
+            if self._filter is not None:
+                for jti in jtis:
+                    self._filter.add(jti)
+            if self._recorded is not None:
+                self._recorded.extend(jtis)
+        transaction.on_commit(bump_blacklist_version)
+
+    def load(self):
+        """Build a new filter from every blacklisted JTI and put it in service."""
+        count = BlacklistedToken.objects.count()
+        bloom = BloomFilter(max(self.capacity, 2 * count), self.false_positive_rate)
+        last_id = self._fill(bloom, 0)
+        with self._lock:
+            version = get_blacklist_version()
+            self._filter, self._last_id = bloom, self._fill(bloom, last_id)
+            for jti in self._recorded or ():
+                bloom.add(jti)
+            self._recorded = None
+            self._version = version
+
+    def _load_in_background(self):
+        try:
+            self.load()
+        except Exception:
+            with self._lock:
+                self._started = False
+                self._recorded = None
+            raise
+        finally:
+            connection.close()
+
+    def _catch_up(self, version):
+        self._last_id = self._fill(self._filter, self._last_id)
+        self._version = version
+        if self._filter.count > self._filter.capacity and self._recorded is None:
+            self._start_loader()
+
+    def _start_loader(self):
+        self._recorded = []
+        self._loader = threading.Thread(target=self._load_in_background, name='blacklist-filter', daemon=True)
+        self._loader.start()
+
+    @staticmethod
+    def _fill(bloom, last_id):
+        """Add the rows past ``last_id`` to ``bloom`` and return the last id added."""
+        rows = BlacklistedToken.objects.filter(id__gt=last_id).values_list('id', 'token__jti').order_by('id')
+        for row_id, jti in rows.iterator(chunk_size=10000):
+            bloom.add(jti)
+            last_id = row_id
+        return last_id
+
+
+def get_blacklist_version():
+    cache = caches['revocations']
+    version = cache.get(BLACKLIST_VERSION_KEY)
+    if version is None:
+        cache.add(BLACKLIST_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(BLACKLIST_VERSION_KEY)
+    return version
+
+
+def bump_blacklist_version():
+    cache = caches['revocations']
+    try:
+        cache.incr(BLACKLIST_VERSION_KEY)
+    except ValueError:
+        cache.add(BLACKLIST_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+blacklist_filter = BlacklistFilter.from_settings()
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    if created:
+        blacklist_filter.record([instance.token.jti])
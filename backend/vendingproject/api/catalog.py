@@ -0,0 +1,48 @@
+import threading
+from django.core.cache import caches
+from rest_framework.renderers import JSONRenderer
+from api.serializers import product_rows
+from base.models import Product
+
+
+class CatalogCache:
+    """
+    The rendered JSON of the full product list, cached per catalog version.
+
+    Cache misses are collapsed: while one thread renders a version, other
+    requests for it wait and then reuse its result instead of rendering too.
+    """
+
+    def __init__(self, timeout=60 * 60):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        cache = caches['catalog']
+        key = f'catalog_content_{version}'
+        content = cache.get(key)
+        if content is None:
+            with self._lock:
+                content = cache.get(key)
+                if content is None:
+                    content = self.render()
+                    cache.set(key, content, timeout=self.timeout)
+        return content
+
+    def render(self):
+        return JSONRenderer().render(product_rows.serialize(Product.objects.all()))
+
+
+def catalog_etag(version):
+    return f'"catalog-{version}"'
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+catalog_cache = CatalogCache()
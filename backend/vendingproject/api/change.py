@@ -0,0 +1,80 @@
+from decimal import Decimal
+from math import gcd
+
+# Coins accepted and returned by the machine, in cents.
+COINS = (100, 50, 20, 10, 5)
+COIN_VALUES = [Decimal(coin) / 100 for coin in sorted(COINS)]
+ACCEPTED_COINS = frozenset(COIN_VALUES)
+
+
+def to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+class ChangeTable:
+    """
+    Minimal coin breakdowns for every amount up to ``limit`` cents, computed
+    once with dynamic programming so a lookup is a single list index.
+
+    Deposits are DecimalField(max_digits=10), far too many cents to tabulate.
+    Above ``limit`` an optimal breakdown always contains the largest coin, so
+    larger amounts are folded into the table by paying the excess with it.
+    """
+
+    def __init__(self, coins=COINS, limit=10000):
+        self.coins = tuple(sorted(coins, reverse=True))
+        self.unit = 0
+        for coin in self.coins:
+            self.unit = gcd(self.unit, coin)
+        self.largest = self.coins[0]
+        self.limit = max(limit, self.coins[0] * self.coins[1] if len(self.coins) > 1 else limit)
+
+        size = self.limit // self.unit + 1
+        counts = [0] + [None] * (size - 1)
+        last = [None] * size
+        for n in range(1, size):
+            for coin in self.coins:
+                step = coin // self.unit
+                if step <= n and counts[n - step] is not None:
+                    if counts[n] is None or counts[n - step] + 1 < counts[n]:
+                        counts[n] = counts[n - step] + 1
+                        last[n] = coin
+
+        self.table = [()] * size
+        for n in range(1, size):
+            if last[n] is not None:
+                breakdown = dict(self.table[n - last[n] // self.unit])
+                breakdown[last[n]] = breakdown.get(last[n], 0) + 1
+                self.table[n] = tuple(sorted(breakdown.items(), reverse=True))
+            else:
+                self.table[n] = None
+
+    def breakdown(self, cents):
+        """
+        Return ``{coin: count}`` paying exactly ``cents`` with the fewest
+        coins, or None if it cannot be paid. The machine is taken to hold
+        enough of every coin.
+        """
+        if cents < 0 or cents % self.unit:
+            return None
+
+        extra = 0
+        if cents > self.limit:
+            extra = -(-(cents - self.limit) // self.largest)
+            cents -= extra * self.largest
+
+        entry = self.table[cents // self.unit]
+        if entry is None:
+            return None
+        coins = dict(entry)
+        if extra:
+            coins[self.largest] = coins.get(self.largest, 0) + extra
+        return coins
+
+
+change_table = ChangeTable()
+
+
+def change_coins(amount):
+    """Coins returned for a Decimal amount, keyed by value in cents."""
+    return change_table.breakdown(to_cents(amount))
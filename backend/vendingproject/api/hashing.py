@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class HashingPoolBusy(Exception):
+    pass
+
+
+class HashingPool:
+    """
+    A few threads that do all password hashing for sign-in and registration.
+
+    PBKDF2 runs inside OpenSSL without the GIL, so the threads hash in
+    parallel, but never more than ``workers`` at once: a burst of sign-ins
+    can no longer take every core from the purchase requests. At most
+    ``max_pending`` hashes may be running or queued; past that run() raises
+    HashingPoolBusy straight away instead of making the caller wait.
+    """
+
+    def __init__(self, workers=2, max_pending=8, retry_after=1):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'PASSWORD_HASHING', {})
+        return cls(
+            workers=config.get('WORKERS', 2),
+            max_pending=config.get('MAX_PENDING', 8),
+            retry_after=config.get('RETRY_AFTER', 1),
+        )
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolBusy()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def make_password(self, password):
+        return self.run(hashers.make_password, password)
+
+    def check_password(self, password, encoded):
+        return self.run(hashers.check_password, password, encoded)
+
+
+hashing_pool = HashingPool.from_settings()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import time
+from functools import wraps
+from django.core.cache import caches
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+from api.sharedcache import ValueTooLarge
+
+IN_FLIGHT = 'in-flight'
+# How long a claimed key may stay in flight, and how long a duplicate waits for it.
+IN_FLIGHT_TIMEOUT = 30
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    'Idempotency-Key',
+    OpenApiTypes.STR,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description='Retries with the same key replay the first response instead of running again.',
+)
+
+
+def idempotency_cache_key(user_id, path, key):
+    digest = hashlib.sha256(f'{user_id}:{path}:{key}'.encode()).hexdigest()
+    return f'idempotency_{digest}'
+
+
+def idempotent(view_method):
+    """
+    Make a view method replay its first response for a repeated
+    ``Idempotency-Key`` header.
+
+    Responses live in the ``idempotency`` cache (bounded and TTL-evicted).
+    While the first request is running its key is marked in flight, and a
+    concurrent duplicate waits for the stored response rather than running.
+    A response too large for a cache slot is replaced by a record of the
+    request without a body, so a retry is refused instead of running again.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        cache = caches['idempotency']
+        cache_key = idempotency_cache_key(request.user.id, request.path, key)
+        fingerprint = hashlib.sha256(json.dumps(request.data, sort_keys=True, default=str).encode()).hexdigest()
+
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            if cache.add(cache_key, IN_FLIGHT, timeout=IN_FLIGHT_TIMEOUT):
+                try:
+                    response = view_method(self, request, *args, **kwargs)
+                except Exception:
+                    cache.delete(cache_key)
+                    raise
+
+                if response.status_code >= 500:
+                    cache.delete(cache_key)
+                else:
+                    stored = {'fingerprint': fingerprint, 'status': response.status_code, 'data': response.data}
+                    try:
+                        cache.set(cache_key, stored)
+                    except ValueTooLarge:
+                        cache.set(cache_key, {**stored, 'data': None})
+                return response
+
+            stored = cache.get(cache_key)
+            if stored is not None and stored != IN_FLIGHT:
+                if stored['fingerprint'] != fingerprint:
+                    return Response(
+                        {'error': 'Idempotency-Key was already used with a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if stored['data'] is None:
+                    return Response(
+                        {'error': 'A request with this Idempotency-Key was already processed and its response is too large to replay'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                response = Response(stored['data'], status=stored['status'])
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'error': 'A request with this Idempotency-Key is still in progress'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(POLL_INTERVAL)
+
+    return wrapper
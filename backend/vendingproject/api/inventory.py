@@ -0,0 +1,164 @@
+import atexit
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from base.models import InventoryCheckpoint, Product
+from base.catalog import bump_catalog_version
+
+
+class HotInventory:
+    """
+    In-process stock counters for a few designated "hot" products.
+
+    Purchases reserve units from the counters, then commit the reservation
+    once the buyer's debit has committed, which appends it to a journal file,
+    or release it when the purchase fails. The journaled decrements are
+    written to ``Product.amount_available`` in batches together with the
+    journal sequence number they cover (InventoryCheckpoint). On first use
+    the journal is replayed past the checkpoint, so sales made before a
+    crash are never lost nor applied twice, and a reservation whose purchase
+    never committed was never journaled.
+
+    Counters live in one process: run a single worker when this is enabled.
+    Stock edits made by sellers reach the counters at the next flush.
+    """
+
+    def __init__(self, product_ids, journal_path, batch_size=100, flush_interval=1.0, fsync=False):
+        self.product_ids = frozenset(product_ids)
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._journal = None
+        self._stock = {}
+        self._info = {}
+        self._pending = {}
+        self._reserved = {}
+        self._seq = 0
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'HOT_INVENTORY', {})
+        return cls(
+            config.get('PRODUCT_IDS', []) if config.get('ENABLED') else [],
+            config.get('JOURNAL_PATH', settings.BASE_DIR / 'hot_inventory.journal'),
+            batch_size=config.get('FLUSH_BATCH_SIZE', 100),
+            flush_interval=config.get('FLUSH_INTERVAL', 1.0),
+            fsync=config.get('FSYNC', False),
+        )
+
+    def handles(self, product_id):
+        try:
+            return int(product_id) in self.product_ids
+        except (TypeError, ValueError):
+            return False
+
+    def reserve(self, product_id, quantity):
+        """
+        Take units from the counter and return the product's (name, cost),
+        or None when there is not enough stock.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if product_id not in self._stock:
+                raise Product.DoesNotExist()
+            if self._stock[product_id] < quantity:
+                return None
+
+            self._stock[product_id] -= quantity
+            self._reserved[product_id] = self._reserved.get(product_id, 0) + quantity
+            return self._info[product_id]
+
+    def commit(self, product_id, quantity):
+        """Journal a reservation whose purchase has committed."""
+        with self._lock:
+            self._reserved[product_id] -= quantity
+            self._record(product_id, quantity)
+
+    def release(self, product_id, quantity):
+        with self._lock:
+            self._reserved[product_id] -= quantity
+            self._stock[product_id] += quantity
+
+    def available(self, product_id):
+        with self._lock:
+            self._ensure_loaded()
+            return self._stock.get(product_id)
+
+    def maybe_flush(self):
+        if self._unflushed >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._loaded:
+                self._flush_locked()
+
+    def _record(self, product_id, quantity):
+        self._seq += 1
+        self._journal.write(f'{self._seq} {product_id} {quantity}\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+        self._pending[product_id] = self._pending.get(product_id, 0) + quantity
+        self._unflushed += 1
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+
+        checkpoint = InventoryCheckpoint.objects.values_list('journal_seq', flat=True).filter(pk=1).first() or 0
+        self._seq = checkpoint
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as journal:
+                for line in journal:
+                    try:
+                        seq, product_id, quantity = (int(part) for part in line.split())
+                    except ValueError:
+                        # A torn final line: the reservation never completed.
+                        continue
+                    if seq > checkpoint:
+                        self._pending[product_id] = self._pending.get(product_id, 0) + quantity
+                        self._seq = max(self._seq, seq)
+
+        self._journal = open(self.journal_path, 'a')
+        self._flush_locked()
+        self._loaded = True
+
+    def _flush_locked(self):
+        if self._pending:
+            with transaction.atomic():
+                for product_id, quantity in self._pending.items():
+                    Product.objects.filter(id=product_id).update(
+                        amount_available=Greatest(F('amount_available') - quantity, Value(0))
+                    )
+                InventoryCheckpoint.objects.update_or_create(pk=1, defaults={'journal_seq': self._seq})
+                bump_catalog_version()
+
+        self._journal.truncate(0)
+        self._pending = {}
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+        products = Product.objects.filter(id__in=self.product_ids).values_list('id', 'product_name', 'cost', 'amount_available')
+        self._stock = {}
+        for product_id, product_name, cost, amount_available in products:
+            # Reservations still in flight are not in the database yet.
+            self._stock[product_id] = amount_available - self._reserved.get(product_id, 0)
+            self._info[product_id] = (product_name, cost)
+
+
+hot_inventory = HotInventory.from_settings()
+
+if hot_inventory.product_ids:
+    atexit.register(hot_inventory.flush)
@@ -1,127 +1,114 @@
-import json
 from django.http import JsonResponse
 from rest_framework import status
 from base.models import Product, User
-from rest_framework_simplejwt.tokens import AccessToken
+from api.authentication import authenticate_request
+
+
+def get_request_role(request):
+    if 'role' in request.jwt_token:
+        return request.jwt_token['role']
+
+    # Tokens minted before the role claim existed still need a lookup.
+    return User.objects.get(id=request.jwt_user_id).customuser.role
+
+def unauthorized():
+    return JsonResponse(
+        {'error': 'You are not authorized to perform this action'},
+        status=status.HTTP_401_UNAUTHORIZED
+    )
+
+def check_product_owner(request, view_kwargs):
+    if request.jwt_user_id is None:
+        return unauthorized()
+
+    seller_id = Product.objects.filter(id=view_kwargs['id']).values_list('seller_id', flat=True).first()
+    if seller_id is not None and request.jwt_user_id != seller_id:
+        return JsonResponse(
+            {'error': 'You do not have permission to modify this product'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+def check_similar_user(request, view_kwargs):
+    if request.jwt_user_id is None:
+        return unauthorized()
+
+    if request.jwt_user_id != view_kwargs['id']:
+        return JsonResponse(
+            {'error': 'You do not have permission to modify this user'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+def check_user_seller(request, view_kwargs):
+    if request.jwt_user_id is None:
+        return unauthorized()
 
-def get_user_from_token(token):
     try:
-        token = AccessToken(token)
-        user_id = token.payload.get('user_id')
-        return user_id
+        if get_request_role(request) != 'seller':
+            return JsonResponse(
+                {'error': 'You need to be a seller to perform this action'},
+                status=status.HTTP_403_FORBIDDEN
+            )
     except Exception as e:
-        print(e, 'the error')
-        return None
+        print(e, 'the error in check user seller')
 
+def check_user_buyer(request, view_kwargs):
+    if request.jwt_user_id is None:
+        return unauthorized()
 
-def check_product_owner(get_response):
+    try:
+        if get_request_role(request) != 'buyer':
+            return JsonResponse(
+                {'error': 'You need to be a buyer to perform this action'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+    except Exception as e:
+        print(e, 'the error in check user buyer')
+
+# Checks applied to each (url name, method) of api/urls.py, in order.
+ROUTE_POLICIES = {
+    ('product', 'POST'): (check_user_seller,),
+    ('product_detail', 'PUT'): (check_product_owner, check_user_seller),
+    ('product_detail', 'DELETE'): (check_product_owner, check_user_seller),
+    ('seller_products', 'GET'): (check_user_seller,),
+    ('user_detail', 'PUT'): (check_similar_user,),
+    ('user_detail', 'DELETE'): (check_similar_user,),
+    ('buy', 'POST'): (check_user_buyer,),
+    ('buy_cart', 'POST'): (check_user_buyer,),
+    ('deposit', 'POST'): (check_user_buyer,),
+    ('reset', 'POST'): (check_user_buyer,),
+}
+
+
+def authenticate_token(get_response):
     def middleware(request):
-        if request.method in ['PUT', 'DELETE'] and 'product/' in request.path:
-            try:
-                product_id = int(request.path.split('/')[-2])
-                product = Product.objects.get(id=product_id)
-
-                try:
-                    request_user_id = get_user_from_token(request.headers.get('Authorization', '').split(' ')[1])
-                except Exception as e:
-                    print(e, 'the error in check product owner')
-                    return JsonResponse(
-                        {'error': 'You are not authorized to perform this action'},
-                        status=status.HTTP_401_UNAUTHORIZED
-                    )
-                if request_user_id != product.seller_id.id:
-                    return JsonResponse(
-                        {'error': 'You do not have permission to modify this product'},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except (ValueError, Product.DoesNotExist):
-                pass
+        authenticate_request(request)
 
         response = get_response(request)
         return response
 
     return middleware
 
-def check_similar_user(get_response):
-    def middleware(request):
-        if request.method in ['PUT', 'DELETE'] and 'user/' in request.path:
-            try:
-                user_id = int(request.path.split('/')[-2])
-
-                try:
-                    request_user_id = get_user_from_token(request.headers.get('Authorization', '').split(' ')[1])
-                except Exception as e:
-                    print(e, 'the error in check similar user')
-                    return JsonResponse(
-                        {'error': 'You are not authorized to perform this action'},
-                        status=status.HTTP_401_UNAUTHORIZED
-                    )
-
-                if request_user_id != user_id:
-                    return JsonResponse(
-                        {'error': 'You do not have permission to modify this user'},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except (ValueError, User.DoesNotExist):
-                pass
 
-        response = get_response(request)
-        return response
-
-    return middleware
+class RoutePolicyMiddleware:
+    """
+    Apply the ROUTE_POLICIES checks using the URL match Django already
+    resolved for the request, so routes without a policy (admin, schema,
+    reads) cost a single dictionary lookup.
+    """
 
-def check_user_seller(get_response):
-    def middleware(request):
-        if request.method in ['POST', 'PUT', 'DELETE'] and 'product/' in request.path:
-            try:
-                try:
-                    user_id = get_user_from_token(request.headers.get('Authorization', '').split(' ')[1])
-                except Exception as e:
-                    print(e, 'the error in check user seller')
-                    return JsonResponse(
-                        {'error': 'You are not authorized to perform this action'},
-                        status=status.HTTP_401_UNAUTHORIZED
-                    )
-                user = User.objects.get(id=user_id)
-
-                if user.customuser.role != 'seller':
-                    return JsonResponse(
-                        {'error': 'You need to be a seller to perform this action'},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except Exception as e:
-                print(e, 'the error in check user seller')
-                pass
-        
-        response = get_response(request)
-        return response
+    def __init__(self, get_response):
+        self.get_response = get_response
 
-    return middleware
+    def __call__(self, request):
+        return self.get_response(request)
 
-def check_user_buyer(get_response):
-    def middleware(request):
-        if request.method in ['POST'] and ('buy/' in request.path or 'reset/' in request.path or 'deposit/' in request.path):
-            try:
-                try:
-                    user_id = get_user_from_token(request.headers.get('Authorization', '').split(' ')[1])
-                except Exception as e:
-                    print(e, 'the error in check user buyer')
-                    return JsonResponse(
-                        {'error': 'You are not authorized to perform this action'},
-                        status=status.HTTP_401_UNAUTHORIZED
-                    )
-                user = User.objects.get(id=user_id)
-
-                if user.customuser.role != 'buyer':
-                    return JsonResponse(
-                        {'error': 'You need to be a buyer to perform this action'},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except Exception as e:
-                print(e, 'the error in check user buyer')
-                pass
-        
-        response = get_response(request)
-        return response
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match.namespace:
+            return None
 
-    return middleware
\ No newline at end of file
+        for check in ROUTE_POLICIES.get((match.url_name, request.method), ()):
+            response = check(request, view_kwargs)
+            if response is not None:
+                return response
+        return None
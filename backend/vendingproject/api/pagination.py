@@ -0,0 +1,113 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination:
+    """
+    Cursor pagination that seeks past the last row of the previous page
+    with ``WHERE (a, id) > (x, y)`` instead of counting an OFFSET, so every
+    page costs the same no matter how deep it is.
+
+    ``orderings`` maps the accepted ``ordering`` query values to the fields
+    to sort by; the last field must be unique to keep the order stable.
+    Cursors are opaque base64 tokens carrying the ordering and the keys of
+    the last row.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+
+    def __init__(self, orderings, default_ordering, page_size=50, max_page_size=500):
+        self.orderings = orderings
+        self.default_ordering = default_ordering
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, serialize=list):
+        """
+        Return one page of ``queryset`` and remember the next cursor.
+
+        ``serialize`` turns the sliced queryset into rows; it may return model
+        instances or dicts keyed by field name.
+        """
+        self.request = request
+        ordering = self.default_ordering
+        keys = None
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            ordering, keys = self.decode_cursor(encoded, queryset.model)
+        elif request.query_params.get(self.ordering_query_param) in self.orderings:
+            ordering = request.query_params[self.ordering_query_param]
+
+        order_by = self.orderings[ordering]
+        queryset = queryset.order_by(*order_by)
+        if keys is not None:
+            queryset = queryset.filter(self.seek(order_by, keys))
+
+        page_size = self.get_page_size(request)
+        rows = serialize(queryset[:page_size + 1])
+
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            keys = [last[field] if isinstance(last, dict) else getattr(last, field) for field in order_by]
+            self.next_cursor = self.encode_cursor(ordering, keys)
+        return rows
+
+    def seek(self, order_by, keys):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND (b > y OR (b = y AND c > z)))
+        condition = Q(**{f'{order_by[-1]}__gt': keys[-1]})
+        for field, key in zip(reversed(order_by[:-1]), reversed(keys[:-1])):
+            condition = Q(**{f'{field}__gt': key}) | (Q(**{field: key}) & condition)
+        if len(order_by) > 1:
+            # Redundant bound on the leading column so the index range scan
+            # starts at the cursor instead of the beginning of the index.
+            condition &= Q(**{f'{order_by[0]}__gte': keys[0]})
+        return condition
+
+    def encode_cursor(self, ordering, keys):
+        payload = json.dumps([ordering, keys], default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded, model):
+        """Return the ordering and keys of a cursor, the keys converted to their fields' types."""
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            ordering, keys = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if ordering not in self.orderings or len(keys) != len(self.orderings[ordering]):
+                raise ValueError(encoded)
+            fields = [model._meta.get_field(name) for name in self.orderings[ordering]]
+            if any(key is None or isinstance(key, (list, dict)) for key in keys):
+                raise ValueError(encoded)
+            keys = [field.to_python(key) for field, key in zip(fields, keys)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound('Invalid cursor')
+        return ordering, keys
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.ordering_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, results):
+        return {'next': self.get_next_link(), 'results': results}
@@ -0,0 +1,176 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Case, When, Value, IntegerField
+from base.models import CustomUser, Product
+from base import ledger
+from base.catalog import bump_catalog_version
+from base.events import publish_stock, publish_stock_levels
+from api.inventory import hot_inventory
+
+
+class PurchaseError(Exception):
+    message = 'Purchase failed'
+
+
+class InsufficientStock(PurchaseError):
+    message = 'Insufficient stock'
+
+
+class InsufficientDeposit(PurchaseError):
+    message = 'Insufficient deposit'
+
+
+def purchase_product(user_id, product_id, quantity):
+    """
+    Buy ``quantity`` units of a product with guarded UPDATE statements.
+
+    Stock and deposit are only decremented when ``amount_available`` and
+    ``deposit`` still cover the purchase, so concurrent buyers can never
+    oversell or overdraw. Both updates commit or roll back together.
+    Raises Product.DoesNotExist, InsufficientStock or InsufficientDeposit.
+    """
+    if hot_inventory.handles(product_id):
+        return purchase_hot_product(user_id, product_id, quantity)
+
+    product_name, cost = Product.objects.values_list('product_name', 'cost').get(id=product_id)
+    total_price = cost * quantity
+
+    # Reading the price before the transaction keeps it write-only, so SQLite
+    # never has to upgrade a shared lock while other buyers hold one.
+    with transaction.atomic():
+        # Hot products are sold from the counters only; selling one here
+        # would go unseen by them.
+        updated = Product.objects.filter(
+            id=product_id, amount_available__gte=quantity
+        ).exclude(id__in=hot_inventory.product_ids).update(amount_available=F('amount_available') - quantity)
+        if not updated:
+            raise InsufficientStock()
+
+        change = debit_deposit(user_id, total_price)
+        bump_catalog_version()
+        publish_stock([product_id])
+
+    return {'total_price': total_price, 'product_name': product_name, 'change': change}
+
+
+def purchase_hot_product(user_id, product_id, quantity):
+    reserved = hot_inventory.reserve(product_id, quantity)
+    if reserved is None:
+        raise InsufficientStock()
+
+    product_name, cost = reserved
+    total_price = cost * quantity
+    try:
+        with transaction.atomic():
+            change = debit_deposit(user_id, total_price)
+    except Exception:
+        hot_inventory.release(product_id, quantity)
+        raise
+
+    hot_inventory.commit(product_id, quantity)
+    publish_stock_levels({product_id: hot_inventory.available(product_id)})
+    hot_inventory.maybe_flush()
+    return {'total_price': total_price, 'product_name': product_name, 'change': change}
+
+
+def checkout_cart(user_id, items):
+    """
+    Buy several products at once; ``items`` is a list of
+    ``(product_id, quantity)`` pairs.
+
+    All products are loaded with one query and all stock decrements are done
+    by a single guarded UPDATE, so the whole cart succeeds or fails as a unit.
+    Hot products are reserved from the in-memory counters, committed once the
+    debit has committed and released again if the rest of the cart fails.
+    """
+    quantities = {}
+    for product_id, quantity in items:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    hot = {product_id: quantity for product_id, quantity in quantities.items() if hot_inventory.handles(product_id)}
+    cold = {product_id: quantity for product_id, quantity in quantities.items() if product_id not in hot}
+
+    products = Product.objects.only('product_name', 'cost', 'amount_available').in_bulk(list(cold)) if cold else {}
+    if len(products) != len(cold):
+        raise Product.DoesNotExist()
+
+    lines = []
+    reserved = []
+    try:
+        for product_id, quantity in hot.items():
+            info = hot_inventory.reserve(product_id, quantity)
+            if info is None:
+                raise InsufficientStock()
+            reserved.append((product_id, quantity))
+            lines.append(cart_line(product_id, info[0], info[1], quantity))
+
+        for product_id, quantity in cold.items():
+            product = products[product_id]
+            if product.amount_available < quantity:
+                raise InsufficientStock()
+            lines.append(cart_line(product_id, product.product_name, product.cost, quantity))
+
+        total_price = sum(line['price'] for line in lines)
+
+        with transaction.atomic():
+            if cold:
+                requested = Case(
+                    *[When(id=product_id, then=Value(quantity)) for product_id, quantity in cold.items()],
+                    output_field=IntegerField()
+                )
+                updated = Product.objects.filter(
+                    id__in=list(cold), amount_available__gte=requested
+                ).exclude(id__in=hot_inventory.product_ids).update(amount_available=F('amount_available') - requested)
+                if updated != len(cold):
+                    raise InsufficientStock()
+                bump_catalog_version()
+                publish_stock(cold)
+
+            change = debit_deposit(user_id, total_price)
+    except Exception:
+        for product_id, quantity in reserved:
+            hot_inventory.release(product_id, quantity)
+        raise
+
+    for product_id, quantity in reserved:
+        hot_inventory.commit(product_id, quantity)
+    if hot:
+        publish_stock_levels({product_id: hot_inventory.available(product_id) for product_id in hot})
+        hot_inventory.maybe_flush()
+    return {'total_price': total_price, 'items': lines, 'change': change}
+
+
+def cart_line(product_id, product_name, cost, quantity):
+    return {'product_id': product_id, 'product_name': product_name, 'quantity': quantity, 'price': cost * quantity}
+
+
+def debit_deposit(user_id, amount):
+    updated = CustomUser.objects.filter(
+        user_id=user_id, deposit__gte=amount
+    ).update(deposit=F('deposit') - amount)
+    if not updated:
+        raise InsufficientDeposit()
+    ledger.record(user_id, -amount, ledger.Kind.PURCHASE)
+
+    return CustomUser.objects.values_list('deposit', flat=True).get(user_id=user_id)
+
+
+def credit_deposit(user_id, amount):
+    with transaction.atomic():
+        if CustomUser.objects.filter(user_id=user_id).update(deposit=F('deposit') + amount):
+            ledger.record(user_id, amount, ledger.Kind.DEPOSIT)
+
+
+def reset_deposit(user_id):
+    """Set the deposit to zero and return the amount that was paid out."""
+    while True:
+        deposit = CustomUser.objects.values_list('deposit', flat=True).filter(user_id=user_id).first()
+        if deposit is None:
+            return Decimal('0.00')
+        # Only reset the balance that was read, so a concurrent deposit is
+        # either paid out too or left untouched.
+        with transaction.atomic():
+            if CustomUser.objects.filter(user_id=user_id, deposit=deposit).update(deposit=0):
+                if deposit:
+                    ledger.record(user_id, -deposit, ledger.Kind.RESET)
+                return deposit
@@ -0,0 +1,122 @@
+import heapq
+import itertools
+from django.db import connection
+from django.db.models import Case, Value, When
+from api.serializers import product_rows
+from base.models import Product
+
+# The trigram tokenizer cannot match anything shorter than one trigram.
+TRIGRAM = 3
+# Fuzzy candidates fetched and re-ranked in Python. The same candidates are
+# ranked for every page, so paging never reorders fuzzy matches; matches
+# past the first FUZZY_CANDIDATES in index order are never returned.
+FUZZY_CANDIDATES = 1000
+
+
+def trigrams(text):
+    return {text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)}
+
+
+def chunks(text):
+    """Non-overlapping trigrams covering ``text``; one typo breaks at most one."""
+    pieces = [text[i:i + TRIGRAM] for i in range(0, len(text) - TRIGRAM + 1, TRIGRAM)]
+    if len(text) % TRIGRAM:
+        pieces.append(text[-TRIGRAM:])
+    return list(dict.fromkeys(pieces))
+
+
+def fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def search_products(query, limit, offset=0):
+    """
+    Return up to ``limit`` products whose name matches ``query``, best first.
+
+    Names starting with the query rank first, then names containing it, then
+    fuzzy matches that share at least two chunks of it, by trigram overlap.
+    Each tier is read in index order and stops as soon as the page is full,
+    so no tier ranks every match; queries shorter than a trigram are prefix
+    matches only.
+    """
+    query = query.strip()
+    if connection.vendor != 'sqlite':
+        ids = fallback_search(query, offset + limit)
+    elif len(query) < TRIGRAM:
+        ids = prefix_search(case_variants(query), offset + limit)
+    else:
+        ids = fts_search(query, offset + limit)
+
+    ids = ids[offset:offset + limit]
+    rows = {row['id']: row for row in product_rows.serialize(Product.objects.filter(id__in=ids))}
+    return [rows[id] for id in ids if id in rows]
+
+
+def fts_search(query, limit):
+    # Every capitalisation of a long query is too many scans; the usual ones
+    # cover the prefix tier and any other spelling still ranks as a substring.
+    variants = {query, query.lower(), query.upper(), query.capitalize(), query.title()}
+    ids = prefix_search(variants, limit)
+    query = query.lower()
+    phrase = fts_phrase(query)
+    if len(ids) < limit:
+        seen = set(ids)
+        ids += [id for id in fts_ids(phrase, limit) if id not in seen][:limit - len(ids)]
+    if len(ids) < limit:
+        ids += fuzzy_search(query, limit - len(ids), exclude=phrase)
+    return ids
+
+
+def fuzzy_search(query, limit, exclude):
+    pieces = [fts_phrase(piece) for piece in chunks(query)]
+    if len(pieces) > 2:
+        match = ' OR '.join(f'({a} AND {b})' for a, b in itertools.combinations(pieces, 2))
+    else:
+        match = ' OR '.join(pieces)
+
+    ids = fts_ids(f'({match}) NOT {exclude}', FUZZY_CANDIDATES, columns='rowid, product_name')
+    wanted = trigrams(query)
+
+    def similarity(row):
+        found = trigrams(row[1].lower())
+        return len(wanted & found) / len(wanted | found)
+
+    return [id for id, _ in sorted(ids, key=lambda row: (-similarity(row), row[0]))[:limit]]
+
+
+def fts_ids(match, limit, columns='rowid'):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {columns} FROM base_product_search WHERE base_product_search MATCH %s ORDER BY rowid LIMIT %s',
+            [match, limit],
+        )
+        rows = cursor.fetchall()
+    return rows if columns != 'rowid' else [id for id, in rows]
+
+
+def case_variants(query):
+    return {''.join(chars) for chars in itertools.product(*({c.lower(), c.upper()} for c in query))}
+
+
+def prefix_search(variants, limit):
+    # One range scan of product_name_id_idx per capitalisation of the query,
+    # merged by name; each scan stops after ``limit`` rows.
+    scans = [
+        Product.objects.filter(product_name__gte=variant, product_name__lt=variant[:-1] + chr(ord(variant[-1]) + 1))
+        .order_by('product_name', 'id')
+        .values_list('product_name', 'id')[:limit]
+        for variant in sorted(variants)
+    ]
+    return [id for _, id in itertools.islice(heapq.merge(*scans), limit)]
+
+
+def fallback_search(query, limit):
+    # Other databases have no trigram index here; rank prefix matches first.
+    queryset = (
+        Product.objects.filter(product_name__icontains=query)
+        .annotate(prefix=Case(When(product_name__istartswith=query, then=Value(0)), default=Value(1)))
+        .order_by('prefix', 'id')
+    )
+    if len(query) < TRIGRAM:
+        queryset = queryset.filter(product_name__istartswith=query)
+    return list(queryset.values_list('id', flat=True)[:limit])
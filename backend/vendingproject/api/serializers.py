@@ -1,5 +1,9 @@
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from base.models import Product, User, CustomUser
+from base import ledger
+from api.tokens import revoke_user_tokens
 
 class UserSerializer(serializers.ModelSerializer):
     role = serializers.CharField(source='customuser.role', default='buyer')
@@ -16,11 +20,24 @@ class UserSerializer(serializers.ModelSerializer):
         return user
     
     def update(self, instance, validated_data):
-        customuser_data = validated_data.pop('customuser')
+        customuser_data = validated_data.pop('customuser', {})
         instance = super().update(instance, validated_data)
-        instance.customuser.role = customuser_data.get('role', instance.customuser.role)
-        instance.customuser.deposit += int(customuser_data.get('deposit', 0))
-        instance.customuser.save()
+        customuser = instance.customuser
+        previous_role = customuser.role
+        customuser.role = customuser_data.get('role', previous_role)
+        adjustment = int(customuser_data.get('deposit', 0))
+        # The deposit is moved by purchases concurrently, so it is only ever
+        # adjusted in the database and never written back from this instance.
+        with transaction.atomic():
+            customuser.save(update_fields=['role'])
+            if adjustment:
+                CustomUser.objects.filter(user_id=instance.id).update(deposit=F('deposit') + adjustment)
+                ledger.record(instance.id, adjustment, ledger.Kind.ADJUSTMENT)
+        customuser.refresh_from_db(fields=['deposit'])
+
+        # Tokens carry the role claim, so they must not outlive a role change.
+        if customuser.role != previous_role:
+            revoke_user_tokens(instance.id)
         return instance
     
     def get_role(self, obj):
@@ -29,7 +46,54 @@ class UserSerializer(serializers.ModelSerializer):
     def get_deposit(self, obj):
         return obj.customuser.deposit
 
+class UserExportSerializer(UserSerializer):
+    class Meta(UserSerializer.Meta):
+        fields = ('id', 'username', 'role', 'deposit')
+
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+
+class RowSerializer:
+    """
+    Read-only fast path for the list output of a ModelSerializer.
+
+    Rows are fetched as ``values_list`` tuples and zipped into dicts in the
+    serializer's field order, skipping the per-row field machinery. Fields
+    named in ``encode`` go through the serializer field's own
+    ``to_representation`` so they render exactly as before; NULLs, such as a
+    user without a CustomUser row, stay None just like in ModelSerializer.
+    """
+
+    def __init__(self, serializer_class, encode=()):
+        fields = serializer_class().fields
+        self.names = tuple(fields)
+        self.lookups = tuple(field.source.replace('.', '__') for field in fields.values())
+        self.encoders = tuple((name, self.encoder(fields[name])) for name in encode)
+
+    @staticmethod
+    def encoder(field):
+        to_representation = field.to_representation
+        return lambda value: None if value is None else to_representation(value)
+
+    def serialize(self, queryset):
+        names = self.names
+        data = [dict(zip(names, row)) for row in queryset.values_list(*self.lookups)]
+        for name, encode in self.encoders:
+            for item in data:
+                item[name] = encode(item[name])
+        return data
+
+    def iterate(self, queryset, chunk_size=2000):
+        """Yield the rows one at a time, fetching ``chunk_size`` per round trip."""
+        names, encoders = self.names, self.encoders
+        for row in queryset.values_list(*self.lookups).iterator(chunk_size=chunk_size):
+            item = dict(zip(names, row))
+            for name, encode in encoders:
+                item[name] = encode(item[name])
+            yield item
+
+user_rows = RowSerializer(UserSerializer, encode=('role', 'deposit'))
+user_export_rows = RowSerializer(UserExportSerializer, encode=('role', 'deposit'))
+product_rows = RowSerializer(ProductSerializer, encode=('cost',))
@@ -0,0 +1,99 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.settings import api_settings
+
+
+class SessionRegistry:
+    """
+    Active refresh tokens per user, kept in the cache.
+
+    Each session is its own key, named by the token's JTI and expiring with
+    the token, so signing in or out touches one key instead of re-pickling a
+    list of every session. Sessions are also counted in buckets by expiry
+    time: a bucket's counter expires with the last token in it, and count()
+    adds up the buckets that can still hold live tokens, a fixed number set
+    by the refresh lifetime and ``bucket_seconds`` however many sessions a
+    user has. A session is counted until the end of its bucket.
+
+    add() and remove() only use cache.add, incr, decr and delete, which the
+    cache backends perform atomically. The cache must be large enough never
+    to cull live sessions, hence the separate ``sessions`` cache.
+    """
+
+    def __init__(self, cache_alias='sessions', bucket_seconds=900, lifetime=None):
+        self.cache_alias = cache_alias
+        self.bucket_seconds = bucket_seconds
+        self.lifetime = lifetime
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'SESSION_REGISTRY', {})
+        return cls(
+            cache_alias=config.get('CACHE', 'sessions'),
+            bucket_seconds=config.get('BUCKET_SECONDS', 900),
+        )
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_lifetime(self):
+        if self.lifetime is not None:
+            return self.lifetime
+        return int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
+
+    def session_key(self, user_id, jti):
+        return f'session_{user_id}_{jti}'
+
+    def bucket_key(self, user_id, bucket):
+        return f'sessions_{user_id}_{bucket}'
+
+    def live_buckets(self, user_id, now):
+        first = now // self.bucket_seconds
+        last = (now + self.get_lifetime()) // self.bucket_seconds
+        return [self.bucket_key(user_id, bucket) for bucket in range(first, last + 1)]
+
+    def add(self, token, now=None):
+        """Register a refresh token; returns False if it is expired or already registered."""
+        now = int(time.time()) if now is None else now
+        cache = self.cache
+        user_id, expires = token[api_settings.USER_ID_CLAIM], token['exp']
+        if expires <= now or not cache.add(self.session_key(user_id, token['jti']), expires, timeout=expires - now):
+            return False
+
+        bucket = expires // self.bucket_seconds
+        key = self.bucket_key(user_id, bucket)
+        timeout = (bucket + 1) * self.bucket_seconds - now
+        cache.add(key, 0, timeout=timeout)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Culled between add() and incr().
+            cache.add(key, 1, timeout=timeout)
+        return True
+
+    def remove(self, token):
+        """Unregister a refresh token; returns False if it was not registered."""
+        cache = self.cache
+        user_id = token[api_settings.USER_ID_CLAIM]
+        if not cache.delete(self.session_key(user_id, token['jti'])):
+            return False
+        try:
+            cache.decr(self.bucket_key(user_id, token['exp'] // self.bucket_seconds))
+        except ValueError:
+            pass
+        return True
+
+    def count(self, user_id, now=None):
+        now = int(time.time()) if now is None else now
+        return max(0, sum(self.cache.get_many(self.live_buckets(user_id, now)).values()))
+
+    def clear(self, user_id, jtis=(), now=None):
+        """Forget every session of a user, given the JTIs that may still be registered."""
+        now = int(time.time()) if now is None else now
+        self.cache.delete_many([self.session_key(user_id, jti) for jti in jtis])
+        self.cache.delete_many(self.live_buckets(user_id, now))
+
+
+session_registry = SessionRegistry.from_settings()
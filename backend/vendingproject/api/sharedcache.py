@@ -0,0 +1,464 @@
+import fcntl
+import hashlib
+import itertools
+import math
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+MAGIC = b'VMSHC002'
+# magic, slot count, item size, generation, entry count, LRU head, LRU tail, dirty
+HEADER = struct.Struct('<8sIIIIiiB')
+# generation, key hash, expiry, LRU prev, LRU next, key length, value length, CRC-32 of key and value
+SLOT = struct.Struct('<IQdiiHII')
+U8 = struct.Struct('<B')
+U32 = struct.Struct('<I')
+I32 = struct.Struct('<i')
+F64 = struct.Struct('<d')
+
+GENERATION, COUNT, HEAD, TAIL, DIRTY = 16, 20, 24, 28, 32
+SLOT_EXPIRES, SLOT_PREV, SLOT_NEXT, SLOT_VALUE_LEN, SLOT_CHECKSUM = 12, 20, 24, 30, 34
+NONE = -1
+LOAD_FACTOR = 0.75
+
+
+class ValueTooLarge(ValueError):
+    """A key and pickled value that do not fit in one slot of ITEM_SIZE bytes."""
+
+
+class CacheFull(Exception):
+    """A new key for a cache that does not evict, holding MAX_ENTRIES unexpired entries."""
+
+
+def hash_key(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+class _Table:
+    """
+    Open-addressing hash table laid out in a shared buffer.
+
+    Slots are fixed size and probed linearly; deletes shift the following
+    entries back instead of leaving tombstones. A slot is in use only when
+    its generation equals the table's, so clearing is one header write.
+    Entries also form a doubly linked list from most to least recently used.
+    Every method must be called with the region lock held.
+    """
+
+    def __init__(self, buf, slots, item_size, max_entries, evict=True):
+        self.buf = buf
+        self.slots = slots
+        self.item_size = item_size
+        self.max_entries = max_entries
+        self.evict = evict
+        self.stride = SLOT.size + item_size
+
+    def header(self, offset, field=U32):
+        return field.unpack_from(self.buf, offset)[0]
+
+    def set_header(self, offset, value, field=U32):
+        field.pack_into(self.buf, offset, value)
+
+    def offset(self, index):
+        return HEADER.size + index * self.stride
+
+    def slot(self, index):
+        return SLOT.unpack_from(self.buf, self.offset(index))
+
+    def set_link(self, index, field, value):
+        I32.pack_into(self.buf, self.offset(index) + field, value)
+
+    def initialize(self):
+        self.buf[:HEADER.size] = HEADER.pack(MAGIC, self.slots, self.item_size, 1, 0, NONE, NONE, 0)
+
+    def reset(self):
+        generation = self.header(GENERATION) + 1
+        if generation > 0xFFFFFFFF:
+            # Old slots would come back to life: wipe them instead.
+            chunk = bytes(mmap.PAGESIZE * 256)
+            for start in range(HEADER.size, len(self.buf), len(chunk)):
+                end = min(start + len(chunk), len(self.buf))
+                self.buf[start:end] = chunk[:end - start]
+            generation = 1
+        self.set_header(GENERATION, generation)
+        self.set_header(COUNT, 0)
+        self.set_header(HEAD, NONE, I32)
+        self.set_header(TAIL, NONE, I32)
+
+    def recover(self):
+        """
+        Rebuild the table from the entries left by a process that died while
+        changing it. Entries whose key or checksum do not match, such as one
+        being written at the time, are dropped; the rest are kept, in no
+        particular LRU order.
+        """
+        generation = self.header(GENERATION)
+        entries = {}
+        for index in range(self.slots):
+            slot_generation, key_hash, expires, _, _, key_len, value_len, checksum = self.slot(index)
+            if slot_generation != generation or key_len + value_len > self.item_size:
+                continue
+            start = self.offset(index) + SLOT.size
+            data = bytes(self.buf[start:start + key_len + value_len])
+            key = data[:key_len]
+            if zlib.crc32(data) == checksum and hash_key(key) == key_hash:
+                entries[key] = (key_hash, data[key_len:], expires)
+
+        self.reset()
+        for key, (key_hash, value, expires) in itertools.islice(entries.items(), self.max_entries):
+            self.store(key, key_hash, value, expires)
+
+    def purge(self, now):
+        """Remove every expired entry."""
+        generation = self.header(GENERATION)
+        index = 0
+        while index < self.slots:
+            # A removal shifts the next entry into this slot: look at it again.
+            if self.header(COUNT) and U32.unpack_from(self.buf, self.offset(index))[0] == generation and self.expires(index) <= now:
+                self.remove(index)
+            else:
+                index += 1
+
+    def find(self, key, key_hash):
+        """Return the slot holding ``key``, or None and the free slot where it would go."""
+        generation = self.header(GENERATION)
+        index = key_hash % self.slots
+        while True:
+            slot_generation, slot_hash, _, _, _, key_len, _, _ = self.slot(index)
+            if slot_generation != generation:
+                return None, index
+            if slot_hash == key_hash:
+                start = self.offset(index) + SLOT.size
+                if self.buf[start:start + key_len] == key:
+                    return index, None
+            index = (index + 1) % self.slots
+
+    def live(self, key, key_hash, now):
+        """The slot holding ``key`` unexpired; an expired entry is removed."""
+        index, _ = self.find(key, key_hash)
+        if index is not None and self.expires(index) <= now:
+            self.remove(index)
+            return None
+        return index
+
+    def expires(self, index):
+        return F64.unpack_from(self.buf, self.offset(index) + SLOT_EXPIRES)[0]
+
+    def set_expires(self, index, expires):
+        F64.pack_into(self.buf, self.offset(index) + SLOT_EXPIRES, expires)
+
+    def value(self, index):
+        *_, key_len, value_len, _ = self.slot(index)
+        start = self.offset(index) + SLOT.size + key_len
+        return self.buf[start:start + value_len]
+
+    def store(self, key, key_hash, value, expires, index=None):
+        """Write ``value`` into ``index``, or a new slot when it is None."""
+        if len(key) + len(value) > self.item_size:
+            # Leave any entry already stored under the key as it is.
+            raise ValueTooLarge(f'{len(key) + len(value)} bytes of key and value do not fit in ITEM_SIZE {self.item_size}')
+
+        checksum = zlib.crc32(value, zlib.crc32(key))
+        if index is not None:
+            offset = self.offset(index)
+            F64.pack_into(self.buf, offset + SLOT_EXPIRES, expires)
+            U32.pack_into(self.buf, offset + SLOT_VALUE_LEN, len(value))
+            start = offset + SLOT.size + len(key)
+            self.buf[start:start + len(value)] = value
+            U32.pack_into(self.buf, offset + SLOT_CHECKSUM, checksum)
+            self.touch(index)
+            return
+
+        if self.header(COUNT) >= self.max_entries:
+            if self.evict:
+                self.remove(self.header(TAIL, I32))
+            else:
+                self.purge(time.time())
+                if self.header(COUNT) >= self.max_entries:
+                    raise CacheFull(f'All {self.max_entries} entries are in use')
+        _, index = self.find(key, key_hash)
+        offset = self.offset(index)
+        SLOT.pack_into(self.buf, offset, self.header(GENERATION), key_hash, expires, NONE, NONE, len(key), len(value), checksum)
+        self.buf[offset + SLOT.size:offset + SLOT.size + len(key) + len(value)] = key + value
+        self.push_front(index)
+        self.set_header(COUNT, self.header(COUNT) + 1)
+
+    def touch(self, index):
+        if self.header(HEAD, I32) != index:
+            self.unlink(index)
+            self.push_front(index)
+
+    def push_front(self, index):
+        head = self.header(HEAD, I32)
+        self.set_link(index, SLOT_PREV, NONE)
+        self.set_link(index, SLOT_NEXT, head)
+        self.set_prev(head, index)
+        self.set_header(HEAD, index, I32)
+
+    def unlink(self, index):
+        _, _, _, prev, next, _, _, _ = self.slot(index)
+        self.set_next(prev, next)
+        self.set_prev(next, prev)
+
+    def set_next(self, index, target):
+        """Point the next link of ``index``, or the list head for NONE, at ``target``."""
+        if index == NONE:
+            self.set_header(HEAD, target, I32)
+        else:
+            self.set_link(index, SLOT_NEXT, target)
+
+    def set_prev(self, index, target):
+        """Point the prev link of ``index``, or the list tail for NONE, at ``target``."""
+        if index == NONE:
+            self.set_header(TAIL, target, I32)
+        else:
+            self.set_link(index, SLOT_PREV, target)
+
+    def remove(self, index):
+        self.unlink(index)
+        self.set_header(COUNT, self.header(COUNT) - 1)
+        U32.pack_into(self.buf, self.offset(index), 0)
+
+        # Shift back the entries after the hole that may sit in it.
+        generation = self.header(GENERATION)
+        hole, probe = index, index
+        while True:
+            probe = (probe + 1) % self.slots
+            slot_generation, slot_hash, _, prev, next, key_len, value_len, _ = self.slot(probe)
+            if slot_generation != generation:
+                return
+            home = slot_hash % self.slots
+            if (probe - home) % self.slots >= (probe - hole) % self.slots:
+                source, target = self.offset(probe), self.offset(hole)
+                size = SLOT.size + key_len + value_len
+                self.buf[target:target + size] = self.buf[source:source + size]
+                U32.pack_into(self.buf, source, 0)
+                self.set_next(prev, hole)
+                self.set_prev(next, hole)
+                hole = probe
+
+
+class _Region:
+    """One process's mapping of a cache file, with the lock that guards it."""
+
+    def __init__(self, path, slots, item_size, max_entries, evict):
+        self.pid = os.getpid()
+        self.config = (slots, item_size, max_entries, evict)
+        self.lock = threading.Lock()
+        size = HEADER.size + slots * (SLOT.size + item_size)
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            fresh = os.fstat(self.fd).st_size != size
+            if not fresh:
+                magic, file_slots, file_item_size, *_ = HEADER.unpack(os.pread(self.fd, HEADER.size, 0))
+                fresh = (magic, file_slots, file_item_size) != (MAGIC, slots, item_size)
+            if fresh:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, size)
+            if hasattr(os, 'posix_fallocate'):
+                # Reserve the pages now: a tmpfs that runs out of room later
+                # kills the process with SIGBUS on the write that needs one.
+                try:
+                    os.posix_fallocate(self.fd, 0, size)
+                except OSError as e:
+                    raise ImproperlyConfigured(f'Cannot reserve {size} bytes for shared cache file {path}: {e}') from e
+            self.map = mmap.mmap(self.fd, size)
+            self.table = _Table(self.map, slots, item_size, max_entries, evict)
+            if fresh:
+                self.table.initialize()
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def locked(self):
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                table = self.table
+                # Set while the table is being changed: still set means a
+                # process died mid-change and the table must be rebuilt.
+                if table.header(DIRTY, U8):
+                    table.recover()
+                table.set_header(DIRTY, 1, U8)
+                yield table
+            finally:
+                self.table.set_header(DIRTY, 0, U8)
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+_regions = {}
+_regions_lock = threading.Lock()
+
+
+def _region(path, slots, item_size, max_entries, evict):
+    with _regions_lock:
+        region = _regions.get(path)
+        # A forked worker must not share the parent's file lock.
+        if region is None or region.pid != os.getpid():
+            region = _regions[path] = _Region(path, slots, item_size, max_entries, evict)
+        elif region.config != (slots, item_size, max_entries, evict):
+            raise ImproperlyConfigured(f'Shared cache file {path} is configured twice with different options')
+        return region
+
+
+def relocate(caches, directory, max_entries=None):
+    """
+    Return a copy of a CACHES setting with the file of every SharedMemoryCache
+    moved into ``directory``, and holding at most ``max_entries`` entries when
+    given.
+    """
+    relocated = {}
+    for alias, config in caches.items():
+        if config['BACKEND'] == f'{__name__}.SharedMemoryCache':
+            options = dict(config.get('OPTIONS', {}))
+            if max_entries is not None:
+                options['MAX_ENTRIES'] = min(options.get('MAX_ENTRIES', max_entries), max_entries)
+            config = {**config, 'LOCATION': os.path.join(directory, os.path.basename(config['LOCATION'])), 'OPTIONS': options}
+        relocated[alias] = config
+    return relocated
+
+
+class SharedMemoryCache(BaseCache):
+    """
+    A cache shared by every process on the host, kept in a memory-mapped file.
+
+    LOCATION is the file; put it on a tmpfs such as /dev/shm so it never
+    goes to disk. It holds MAX_ENTRIES entries of at most ITEM_SIZE bytes of
+    key plus pickled value, and is sized for both up front. Writing a value
+    that does not fit raises ValueTooLarge and leaves the key unchanged;
+    set_many() returns such keys instead. When full, the least recently used
+    entry is evicted; expired entries are dropped when they are next looked
+    up. With the EVICT option False, a new key is refused with CacheFull
+    instead, once no expired entry is left to drop.
+
+    Every operation runs under a lock held across processes (flock) and
+    threads, so add(), incr() and decr() are atomic between workers. A worker
+    killed during an operation leaves the table marked, and the next one
+    rebuilds it from the entries that are intact.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.item_size = options.get('ITEM_SIZE', 1024)
+        self.evict = options.get('EVICT', True)
+        self.slots = int(self._max_entries / LOAD_FACTOR) + 1
+
+    def _locked(self):
+        return _region(self.path, self.slots, self.item_size, self._max_entries, self.evict).locked()
+
+    def _key(self, key, version):
+        key = self.make_and_validate_key(key, version=version).encode()
+        return key, hash_key(key)
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return math.inf if expires is None else expires
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, key_hash = self._key(key, version)
+        value = pickle.dumps(value, self.pickle_protocol)
+        with self._locked() as table:
+            if table.live(key, key_hash, time.time()) is not None:
+                return False
+            table.store(key, key_hash, value, self._expires(timeout))
+            return True
+
+    def get(self, key, default=None, version=None):
+        key, key_hash = self._key(key, version)
+        with self._locked() as table:
+            index = table.live(key, key_hash, time.time())
+            if index is None:
+                return default
+            table.touch(index)
+            value = table.value(index)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, key_hash = self._key(key, version)
+        value = pickle.dumps(value, self.pickle_protocol)
+        with self._locked() as table:
+            index, _ = table.find(key, key_hash)
+            table.store(key, key_hash, value, self._expires(timeout), index)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, key_hash = self._key(key, version)
+        with self._locked() as table:
+            index = table.live(key, key_hash, time.time())
+            if index is None:
+                return False
+            table.set_expires(index, self._expires(timeout))
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        encoded, key_hash = self._key(key, version)
+        with self._locked() as table:
+            index = table.live(encoded, key_hash, time.time())
+            if index is not None:
+                value = pickle.loads(table.value(index)) + delta
+                table.store(encoded, key_hash, pickle.dumps(value, self.pickle_protocol), table.expires(index), index)
+                return value
+        raise ValueError(f"Key '{key}' not found")
+
+    def has_key(self, key, version=None):
+        key, key_hash = self._key(key, version)
+        with self._locked() as table:
+            return table.live(key, key_hash, time.time()) is not None
+
+    def delete(self, key, version=None):
+        key, key_hash = self._key(key, version)
+        with self._locked() as table:
+            index = table.live(key, key_hash, time.time())
+            if index is None:
+                return False
+            table.remove(index)
+            return True
+
+    def get_many(self, keys, version=None):
+        keys = {key: self._key(key, version) for key in keys}
+        values = {}
+        with self._locked() as table:
+            now = time.time()
+            for key, (encoded, key_hash) in keys.items():
+                index = table.live(encoded, key_hash, now)
+                if index is not None:
+                    table.touch(index)
+                    values[key] = table.value(index)
+        return {key: pickle.loads(value) for key, value in values.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        entries = [(*self._key(key, version), pickle.dumps(value, self.pickle_protocol)) for key, value in data.items()]
+        expires = self._expires(timeout)
+        failed = []
+        with self._locked() as table:
+            for original, (key, key_hash, value) in zip(data, entries):
+                index, _ = table.find(key, key_hash)
+                try:
+                    table.store(key, key_hash, value, expires, index)
+                except ValueTooLarge:
+                    failed.append(original)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._locked() as table:
+            for key, key_hash in keys:
+                index, _ = table.find(key, key_hash)
+                if index is not None:
+                    table.remove(index)
+
+    def clear(self):
+        with self._locked() as table:
+            table.reset()
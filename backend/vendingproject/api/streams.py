@@ -0,0 +1,64 @@
+import json
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from api.authentication import authenticate_request
+from api.tokens import StreamToken
+from base.events import STOCK_TOPIC, deposit_topic, hub
+
+# Seconds between comment lines that keep idle proxies from closing the stream.
+KEEPALIVE = 15
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events with every stock change and, for a signed-in caller,
+    their own deposit changes.
+
+    Meant to be served by an ASGI server from vendingproject.asgi, where
+    each open stream is a coroutine waiting on the event hub rather than a
+    worker thread.
+
+    Browsers cannot set headers on an EventSource, so they sign in with a
+    StreamToken from POST /api/events/token/ instead of the bearer token:
+
+        const { data } = await axiosInstance.post(`${API_URL}/api/events/token/`);
+        const events = new EventSource(`${API_URL}/api/events/?token=${data.token}`);
+
+    The token expires a minute after it was issued. When the stream drops,
+    fetch a new token and open a new EventSource rather than letting the
+    browser reconnect with the expired URL.
+    """
+    stream_token = request.GET.get('token')
+    if stream_token is not None and request.jwt_token is None:
+        authenticate_request(request, stream_token, StreamToken)
+
+    if request.jwt_error is not None:
+        return JsonResponse({'error': 'Invalid or expired token'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    topics = [STOCK_TOPIC]
+    if request.jwt_user_id is not None:
+        topics.append(deposit_topic(request.jwt_user_id))
+
+    response = StreamingHttpResponse(sse_events(topics), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def sse_events(topics, keepalive=KEEPALIVE):
+    subscription = hub.subscribe(topics)
+    try:
+        yield ': connected\n\n'
+        while True:
+            event = await subscription.get(timeout=keepalive)
+            if event is not None:
+                name, data = event
+                yield f'event: {name}\ndata: {json.dumps(data)}\n\n'
+            elif subscription.overflowed:
+                # Too far behind: tell the client to reload its state and reconnect.
+                yield 'event: overflow\ndata: {}\n\n'
+                return
+            else:
+                yield ': keepalive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
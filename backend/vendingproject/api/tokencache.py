@@ -0,0 +1,90 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+def user_key(user_id):
+    # The claim may be a string or an int depending on the simplejwt version,
+    # while callers evicting a user pass the primary key.
+    return str(user_id)
+
+
+class VerifiedTokenCache:
+    """
+    Access tokens that passed signature and claim verification, kept until
+    they expire so a kiosk reusing its token is not verified again on every
+    request.
+
+    Entries are keyed by a SHA-256 digest of the raw token, hold at most
+    ``max_entries`` tokens in least-recently-used order, and are dropped
+    once past their ``exp`` claim. Revocation does not depend on eviction:
+    callers still check the cached token with check_not_revoked, and the
+    evict hooks only free entries that can no longer be used.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()
+        self._by_user = {}
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'VERIFIED_TOKEN_CACHE', {})
+        return cls(max_entries=config.get('MAX_ENTRIES', 10000))
+
+    def digest(self, raw_token):
+        return hashlib.sha256(raw_token.encode()).digest()
+
+    def get(self, raw_token, now=None):
+        now = time.time() if now is None else now
+        key = self.digest(raw_token)
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None:
+                return None
+            if token['exp'] <= now:
+                self._remove(key)
+                return None
+            self._tokens.move_to_end(key)
+            return token
+
+    def put(self, raw_token, token):
+        if self.max_entries <= 0:
+            return
+        key = self.digest(raw_token)
+        with self._lock:
+            if key not in self._tokens:
+                self._by_user.setdefault(user_key(token.get('user_id')), set()).add(key)
+            self._tokens[key] = token
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.max_entries:
+                self._remove(next(iter(self._tokens)))
+
+    def evict(self, raw_token):
+        with self._lock:
+            self._remove(self.digest(raw_token))
+
+    def evict_user(self, user_id):
+        with self._lock:
+            for key in list(self._by_user.get(user_key(user_id), ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+            self._by_user.clear()
+
+    def _remove(self, key):
+        token = self._tokens.pop(key, None)
+        if token is not None:
+            user_id = user_key(token.get('user_id'))
+            keys = self._by_user.get(user_id)
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+
+verified_tokens = VerifiedTokenCache.from_settings()
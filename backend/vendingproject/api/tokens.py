@@ -0,0 +1,119 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from api.blacklist import blacklist_filter
+from api.sessions import session_registry
+from api.tokencache import verified_tokens
+from base.models import CustomUser
+
+# ``iat`` has whole seconds only, too coarse to order a token against a role
+# change made in the same second. Copied into access tokens like ``role``.
+ISSUED_AT_NS_CLAIM = 'iat_ns'
+
+
+class RoleRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the ``role`` claim of the user's CustomUser.
+
+    The claim is copied into every access token minted from it, so the role
+    gating middlewares can authorize without a database lookup.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        # Before the role is read, so a token minted during a role change is
+        # never stamped as newer than the change.
+        token[ISSUED_AT_NS_CLAIM] = time.time_ns()
+        try:
+            token['role'] = user.customuser.role
+        except CustomUser.DoesNotExist:
+            pass
+        return token
+
+    def check_blacklist(self):
+        # Most tokens were never blacklisted: only ask the database when the
+        # filter says this one might have been.
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+class StreamToken(Token):
+    """
+    Short-lived token that opens the event stream and nothing else.
+
+    A browser EventSource cannot send an Authorization header, so it passes
+    this token in the ``token`` query parameter instead. Query strings end up
+    in access logs, hence the one-minute lifetime: it is only checked when
+    the stream is opened.
+    """
+
+    token_type = 'stream'
+    lifetime = timedelta(minutes=1)
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[ISSUED_AT_NS_CLAIM] = time.time_ns()
+        return token
+
+
+def issued_at_ns(token):
+    # Tokens minted before the claim existed count from the start of their second.
+    issued = token.get(ISSUED_AT_NS_CLAIM)
+    return issued if issued is not None else token.get('iat', 0) * 10 ** 9
+
+
+def revoked_before_key(user_id):
+    return f'tokens_revoked_before_{user_id}'
+
+
+def revoke_user_tokens(user_id):
+    """
+    Invalidate every token issued to a user so far.
+
+    Outstanding refresh tokens are blacklisted, and access tokens issued
+    up to now, to the nanosecond, are rejected by the authentication stage until they expire.
+    """
+    caches['revocations'].set(
+        revoked_before_key(user_id),
+        time.time_ns(),
+        timeout=settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+    )
+    blacklist_user_tokens(user_id)
+
+
+def blacklist_user_tokens(user_id):
+    """
+    Blacklist every outstanding refresh token of a user and forget their sessions.
+
+    Every refresh token gets its OutstandingToken row when it is issued, so
+    this is one read of the live rows and one bulk insert however many
+    sessions the user has.
+    """
+    with transaction.atomic():
+        outstanding = list(
+            OutstandingToken.objects
+            .filter(user_id=user_id, expires_at__gt=timezone.now(), blacklistedtoken__isnull=True)
+            .values_list('id', 'jti')
+        )
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token_id=token_id) for token_id, _ in outstanding],
+            ignore_conflicts=True,
+        )
+        blacklist_filter.record([jti for _, jti in outstanding])
+    session_registry.clear(user_id, [jti for _, jti in outstanding])
+    verified_tokens.evict_user(user_id)
+
+
+def check_not_revoked(token):
+    revoked_before = caches['revocations'].get(revoked_before_key(token.get('user_id')))
+    if revoked_before is not None and issued_at_ns(token) <= revoked_before:
+        raise TokenError('Token has been revoked')
@@ -1,8 +1,9 @@
 from django.urls import path
-from . import views
+from . import views, streams
 
 urlpatterns = [
     path('user/', views.UserRegistrationAndListView.as_view(), name='user'),
+    path('user/export/', views.UserExportView.as_view(), name='user_export'),
     path('user/<int:id>/', views.UserDetailManagementView.as_view(), name='user_detail'),
     path('signin/', views.UserAuthenticationView.as_view(), name='signin'),
     path('refresh/', views.TokenRefreshView.as_view(), name='refresh'),
@@ -10,9 +11,16 @@ urlpatterns = [
     path('product/', views.ProductCreationView.as_view(), name='product'),
     path('product/<int:id>/', views.ProductUpdateDeleteView.as_view(), name='product_detail'),
     path('product/get/', views.ProductListView.as_view(), name='product_get'),
+    path('product/export/', views.ProductExportView.as_view(), name='product_export'),
+    path('product/search/', views.ProductSearchView.as_view(), name='product_search'),
+    path('product/in-stock/', views.InStockProductListView.as_view(), name='product_in_stock'),
+    path('seller/products/', views.SellerInventoryView.as_view(), name='seller_products'),
     path('deposit/', views.UserDepositView.as_view(), name='deposit'),
     path('buy/', views.ProductPurchaseView.as_view(), name='buy'),
+    path('buy/cart/', views.CartCheckoutView.as_view(), name='buy_cart'),
     path('reset/', views.UserDepositResetView.as_view(), name='reset'),
     path('logout/all/', views.UserLogoutAllView.as_view(), name='logout_all'),
-    path('active-sessions/', views.ActiveSessionsCountView.as_view(), name='active_sessions')
+    path('active-sessions/', views.ActiveSessionsCountView.as_view(), name='active_sessions'),
+    path('events/', streams.event_stream, name='events'),
+    path('events/token/', views.StreamTokenView.as_view(), name='events_token'),
 ]
\ No newline at end of file
@@ -1,18 +1,45 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth.hashers import make_password, check_password
-from api.serializers import UserSerializer, ProductSerializer
-from base.models import User, Product
+from api.serializers import UserSerializer, ProductSerializer, user_rows, user_export_rows, product_rows
+from api.tokens import RoleRefreshToken, StreamToken, blacklist_user_tokens
+from api.sessions import session_registry
+from api.authentication import get_raw_token
+from api.tokencache import verified_tokens
+from api.purchases import purchase_product, checkout_cart, credit_deposit, reset_deposit, PurchaseError
+from api.change import COIN_VALUES, ACCEPTED_COINS, change_coins
+from api.idempotency import idempotent, IDEMPOTENCY_KEY_PARAMETER
+from api.pagination import KeysetPagination
+from api.catalog import catalog_cache, catalog_etag, etag_matches
+from api.search import search_products
+from api.exports import export_response, OUTPUTS
+from api.hashing import hashing_pool, HashingPoolBusy
+from base.catalog import get_catalog_version
+from base.models import User, CustomUser, Product
 from rest_framework_simplejwt.exceptions import TokenError
-from decimal import Decimal
-from django.core.cache import cache
-from django.conf import settings
+from decimal import Decimal, InvalidOperation
+from django.http import HttpResponse
+from rest_framework.utils.urls import replace_query_param
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
 
+EXPORT_OUTPUT_PARAMETER = OpenApiParameter('output', OpenApiTypes.STR, enum=list(OUTPUTS), description='Newline-delimited JSON (default) or CSV.')
+
+def hashing_busy():
+    return Response(
+        {'error': 'Too many sign-ins in progress, please retry shortly'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(hashing_pool.retry_after)},
+    )
+
+def product_pagination():
+    return KeysetPagination({'id': ('id',), 'product_name': ('product_name', 'id')}, default_ordering='id')
+
+def user_pagination():
+    # Usernames are unique, so they order the pages on their own.
+    return KeysetPagination({'id': ('id',), 'username': ('username',)}, default_ordering='id')
+
 class UserRegistrationAndListView(APIView):
     @extend_schema(request=UserSerializer, responses={201: UserSerializer})
     def post(self, request):
@@ -22,7 +49,10 @@ class UserRegistrationAndListView(APIView):
                 if User.objects.filter(username=request.data.get('username')).exists():
                     return Response({'error': 'Username already exists'}, status=status.HTTP_400_BAD_REQUEST)
                 
-                serializer.validated_data['password'] = make_password(serializer.validated_data['password'])
+                try:
+                    serializer.validated_data['password'] = hashing_pool.make_password(serializer.validated_data['password'])
+                except HashingPoolBusy:
+                    return hashing_busy()
                 serializer.save()
 
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -31,15 +61,47 @@ class UserRegistrationAndListView(APIView):
         except Exception as e:
             return Response({'error': list(dict(e).values())[0]}, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('role', OpenApiTypes.STR, enum=['buyer', 'seller']),
+            OpenApiParameter('cursor', OpenApiTypes.STR, description='Opaque cursor from the previous page\'s "next" link.'),
+            OpenApiParameter('page_size', OpenApiTypes.INT, description='Users per page (max 500). Paginates the list when given.'),
+            OpenApiParameter('ordering', OpenApiTypes.STR, enum=['id', 'username']),
+        ],
+        responses={200: UserSerializer(many=True)},
+    )
     def get(self, request):
+        # user_rows reads the CustomUser columns through one LEFT JOIN, so the
+        # list is a single query whatever its length.
         users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        role = request.query_params.get('role')
+        if role is not None:
+            if role not in CustomUser.Role.values:
+                return Response({'error': 'Role must be buyer or seller'}, status=status.HTTP_400_BAD_REQUEST)
+            users = users.filter(customuser__role=role)
+
+        pagination = user_pagination()
+        if pagination.is_requested(request):
+            users = pagination.paginate_queryset(users, request, serialize=user_rows.serialize)
+            return Response(pagination.get_paginated_data(users))
+        return Response(user_rows.serialize(users))
+
+class UserExportView(APIView):
+    # Every account in one response: staff only, and never the password hashes.
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER], responses={200: OpenApiTypes.STR})
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in OUTPUTS:
+            return Response({'error': 'Output must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(User.objects.order_by('id'), user_export_rows, output, 'users')
 
 class UserDepositView(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request=OpenApiTypes.OBJECT,
         responses={200: OpenApiTypes.OBJECT},
         examples=[
@@ -48,36 +110,81 @@ class UserDepositView(APIView):
                 value={'amount': '0.50'},
                 request_only=True,
             ),
+            OpenApiExample(
+                'Batch Deposit Request',
+                value={'coins': ['0.50', '0.20', '0.30']},
+                request_only=True,
+            ),
             OpenApiExample(
                 'Deposit Response',
                 value={'message': 'Deposit successful'},
                 response_only=True,
             ),
+            OpenApiExample(
+                'Batch Deposit Response',
+                value={
+                    'message': 'Deposit successful',
+                    'deposited': '0.70',
+                    'coins': [
+                        {'coin': '0.50', 'accepted': True},
+                        {'coin': '0.20', 'accepted': True},
+                        {'coin': '0.30', 'accepted': False},
+                    ],
+                },
+                response_only=True,
+            ),
         ],
     )
+    @idempotent
     def post(self, request):
-        user = request.user
+        if 'coins' in request.data:
+            return self.post_coins(request)
+
         amount = request.data.get('amount')
 
         if amount:
-            custom_user = user.customuser
             amount = Decimal(amount).quantize(Decimal('0.01'))
 
-            valid_coins = [Decimal('0.05'), Decimal('0.10'), Decimal('0.20'), Decimal('0.50'), Decimal('1.00')]
-            if amount not in valid_coins:
+            if amount not in COIN_VALUES:
                 return Response({'error': 'Invalid coin value. Only 5, 10, 20, 50 cent and 1 euro coins are accepted'}, status=status.HTTP_400_BAD_REQUEST)
 
-            custom_user.deposit += Decimal(amount)
-
-            custom_user.save()
+            credit_deposit(request.user.id, amount)
 
             return Response({'message': 'Deposit successful'}, status=status.HTTP_200_OK)
         return Response({'error': 'Amount is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def post_coins(self, request):
+        coins = request.data.getlist('coins') if hasattr(request.data, 'getlist') else request.data.get('coins')
+        if not isinstance(coins, list) or not coins:
+            return Response({'error': 'Coins must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        total = Decimal('0.00')
+        for coin in coins:
+            try:
+                value = Decimal(str(coin)).quantize(Decimal('0.01'))
+            except (InvalidOperation, ValueError):
+                value = None
+
+            accepted = value in ACCEPTED_COINS
+            if accepted:
+                total += value
+            results.append({'coin': str(value) if value is not None else str(coin), 'accepted': accepted})
+
+        if not total:
+            return Response(
+                {'error': 'No valid coin. Only 5, 10, 20, 50 cent and 1 euro coins are accepted', 'coins': results},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        credit_deposit(request.user.id, total)
+
+        return Response({'message': 'Deposit successful', 'deposited': total, 'coins': results}, status=status.HTTP_200_OK)
     
 class ProductPurchaseView(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
         request=OpenApiTypes.OBJECT,
         responses={200: OpenApiTypes.OBJECT},
         examples=[
@@ -88,41 +195,87 @@ class ProductPurchaseView(APIView):
             ),
             OpenApiExample(
                 'Purchase Response',
-                value={'total_price': '2.00', 'product_name': 'Sample Product', 'change': '3.00'},
+                value={'total_price': '2.00', 'product_name': 'Sample Product', 'change': '3.00', 'coins': {'100': 3}},
                 response_only=True,
             ),
         ],
     )
+    @idempotent
     def post(self, request):
         user = request.user
-        quantity = int(request.data.get('quantity'))
-        product_id = request.data.get('product_id')
+        try:
+            quantity = int(request.data.get('quantity'))
+            product_id = int(request.data.get('product_id'))
+        except (TypeError, ValueError):
+            return Response({'error': 'Product ID and quantity are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if quantity < 0:
+            return Response({'error': 'Quantity must be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
 
         if product_id and quantity:
             try:
-                product = Product.objects.get(id=product_id)
+                result = purchase_product(user.id, product_id, quantity)
             except Product.DoesNotExist:
                 return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+            except PurchaseError as e:
+                return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
-            total_price = product.cost * quantity
+            result['coins'] = change_coins(result['change'])
+            return Response(result, status=status.HTTP_200_OK)
 
-            if product.amount_available < quantity:
-                return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'error': 'Product ID and quantity are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-            custom_user = user.customuser
+class CartCheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
 
-            if custom_user.deposit >= total_price:
-                custom_user.deposit -= total_price
-                custom_user.save()
+    @extend_schema(
+        parameters=[IDEMPOTENCY_KEY_PARAMETER],
+        request=OpenApiTypes.OBJECT,
+        responses={200: OpenApiTypes.OBJECT},
+        examples=[
+            OpenApiExample(
+                'Checkout Request',
+                value={'items': [{'product_id': 1, 'quantity': 2}, {'product_id': 2, 'quantity': 1}]},
+                request_only=True,
+            ),
+            OpenApiExample(
+                'Checkout Response',
+                value={
+                    'total_price': '2.50',
+                    'items': [
+                        {'product_id': 1, 'product_name': 'Sample Product', 'quantity': 2, 'price': '2.00'},
+                        {'product_id': 2, 'product_name': 'Other Product', 'quantity': 1, 'price': '0.50'},
+                    ],
+                    'change': '2.50',
+                    'coins': {'100': 2, '50': 1},
+                },
+                response_only=True,
+            ),
+        ],
+    )
+    @idempotent
+    def post(self, request):
+        items = request.data.get('items')
 
-                product.amount_available -= quantity
-                product.save()
+        try:
+            items = [(int(item['product_id']), int(item['quantity'])) for item in items]
+        except (TypeError, KeyError, ValueError):
+            items = None
 
-                return Response({'total_price': total_price, 'product_name': product.product_name, 'change': custom_user.deposit}, status=status.HTTP_200_OK)
-            else:
-                return Response({'error': 'Insufficient deposit'}, status=status.HTTP_400_BAD_REQUEST)
+        if not items:
+            return Response({'error': 'Items with product ID and quantity are required'}, status=status.HTTP_400_BAD_REQUEST)
+        if any(quantity <= 0 for _, quantity in items):
+            return Response({'error': 'Quantity must be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({'error': 'Product ID and quantity are required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = checkout_cart(request.user.id, items)
+        except Product.DoesNotExist:
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        except PurchaseError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+        result['coins'] = change_coins(result['change'])
+        return Response(result, status=status.HTTP_200_OK)
 
 class UserDepositResetView(APIView):
     permission_classes = [IsAuthenticated]
@@ -132,17 +285,14 @@ class UserDepositResetView(APIView):
         examples=[
             OpenApiExample(
                 'Reset Response',
-                value={'message': 'Deposit reset successfully'},
+                value={'message': 'Deposit reset successfully', 'change': '0.70', 'coins': {'50': 1, '20': 1}},
                 response_only=True,
             ),
         ],
     )
     def post(self, request):
-        user = request.user
-        custom_user = user.customuser
-        custom_user.deposit = 0
-        custom_user.save()
-        return Response({'message': 'Deposit reset successfully'}, status=status.HTTP_200_OK)
+        change = reset_deposit(request.user.id)
+        return Response({'message': 'Deposit reset successfully', 'change': change, 'coins': change_coins(change)}, status=status.HTTP_200_OK)
 
 
 class UserDetailManagementView(APIView):
@@ -151,7 +301,7 @@ class UserDetailManagementView(APIView):
     @extend_schema(responses={200: UserSerializer})
     def get(self, request, id):
         try:
-            user = User.objects.get(id=id)
+            user = User.objects.select_related('customuser').get(id=id)
             serializer = UserSerializer(user)
             return Response(serializer.data)
         except User.DoesNotExist:
@@ -160,7 +310,7 @@ class UserDetailManagementView(APIView):
     @extend_schema(request=UserSerializer, responses={200: UserSerializer})
     def put(self, request, id):
         try:
-            user = User.objects.get(id=id)
+            user = User.objects.select_related('customuser').get(id=id)
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -168,7 +318,10 @@ class UserDetailManagementView(APIView):
         update_data = {key: value for key, value in request.data.items() if key in allowed_fields}
 
         if 'password' in update_data:
-            update_data['password'] = make_password(update_data['password'])
+            try:
+                update_data['password'] = hashing_pool.make_password(update_data['password'])
+            except HashingPoolBusy:
+                return hashing_busy()
 
         serializer = UserSerializer(user, data=update_data, partial=True)
         try:
@@ -215,15 +368,11 @@ class UserAuthenticationView(APIView):
             return Response({'error': 'Username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            user = User.objects.get(username=username)
-            if check_password(password, user.password):
-                active_sessions = cache.get(f'active_sessions_{user.id}', [])
-
-                refresh = RefreshToken.for_user(user)
+            user = User.objects.select_related('customuser').get(username=username)
+            if hashing_pool.check_password(password, user.password):
+                refresh = RoleRefreshToken.for_user(user)
                 access_token = refresh.access_token
-
-                active_sessions.append(str(refresh))
-                cache.set(f'active_sessions_{user.id}', active_sessions, timeout=settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
+                session_registry.add(refresh)
 
                 return Response({
                     'refresh': str(refresh),
@@ -234,6 +383,8 @@ class UserAuthenticationView(APIView):
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        except HashingPoolBusy:
+            return hashing_busy()
 
 class ActiveSessionsCountView(APIView):
     permission_classes = [IsAuthenticated]
@@ -249,9 +400,28 @@ class ActiveSessionsCountView(APIView):
         ],
     )
     def get(self, request):
-        user_id = request.user.id
-        active_sessions = cache.get(f'active_sessions_{user_id}', [])
-        return Response({'active_sessions': len(active_sessions)}, status=status.HTTP_200_OK)
+        return Response({'active_sessions': session_registry.count(request.user.id)}, status=status.HTTP_200_OK)
+
+class StreamTokenView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        request=None,
+        responses={200: OpenApiTypes.OBJECT},
+        examples=[
+            OpenApiExample(
+                'Stream Token Response',
+                value={'token': 'stream_token', 'expires_in': 60},
+                response_only=True,
+            ),
+        ],
+    )
+    def post(self, request):
+        token = StreamToken.for_user(request.user)
+        return Response(
+            {'token': str(token), 'expires_in': int(StreamToken.lifetime.total_seconds())},
+            status=status.HTTP_200_OK
+        )
 
 class TokenRefreshView(APIView):
     permission_classes = [AllowAny]
@@ -278,7 +448,7 @@ class TokenRefreshView(APIView):
             return Response({'error': 'Refresh token is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            refresh = RefreshToken(refresh_token)
+            refresh = RoleRefreshToken(refresh_token)
             access_token = str(refresh.access_token)
             
             return Response({
@@ -309,17 +479,11 @@ class UserLogoutView(APIView):
     def post(self, request):
         try:    
             refresh_token = request.data.get('refresh_token')
-            token = RefreshToken(refresh_token)
+            token = RoleRefreshToken(refresh_token)
             token.blacklist()
+            session_registry.remove(token)
+            verified_tokens.evict(get_raw_token(request))
 
-            user_id = request.user.id
-            active_sessions = cache.get(f'active_sessions_{user_id}', [])
-            token = request.headers.get('Authorization', '').split(' ')[1]
-
-            if token in active_sessions:
-                active_sessions.remove(token)
-                cache.set(f'active_sessions_{user_id}', active_sessions, timeout=settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
-            
             return Response('Logged out successfully', status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -338,27 +502,146 @@ class UserLogoutAllView(APIView):
         ],
     )
     def post(self, request):
-        user_id = request.user.id
-        active_sessions = cache.get(f'active_sessions_{user_id}', [])
-
-        for token in active_sessions:
-            try:
-                RefreshToken(token).blacklist()
-            except TokenError:
-                pass 
-
-        cache.delete(f'active_sessions_{user_id}')
+        blacklist_user_tokens(request.user.id)
 
         return Response('All sessions logged out successfully', status=status.HTTP_200_OK)
 
 class ProductListView(APIView):
+    # The catalog is public; skipping authentication keeps a 304 free of
+    # queries even when the client sends its bearer token along.
+    authentication_classes = ()
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('cursor', OpenApiTypes.STR, description='Opaque cursor from the previous page\'s "next" link.'),
+            OpenApiParameter('page_size', OpenApiTypes.INT, description='Products per page (max 500). Paginates the list when given.'),
+            OpenApiParameter('ordering', OpenApiTypes.STR, enum=['id', 'product_name']),
+        ],
+        responses={200: ProductSerializer(many=True)},
+    )
+    def get(self, request):
+        pagination = product_pagination()
+        if pagination.is_requested(request):
+            products = pagination.paginate_queryset(Product.objects.all(), request, serialize=product_rows.serialize)
+            return Response(pagination.get_paginated_data(products))
+
+        if request.accepted_renderer.format != 'json':
+            return Response(product_rows.serialize(Product.objects.all()))
+
+        version = get_catalog_version()
+        etag = catalog_etag(version)
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(catalog_cache.get(version), content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+class ProductExportView(APIView):
     permission_classes = [AllowAny]
 
-    @extend_schema(responses={200: ProductSerializer(many=True)})
+    @extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER], responses={200: OpenApiTypes.STR})
     def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        output = request.query_params.get('output', 'ndjson')
+        if output not in OUTPUTS:
+            return Response({'error': 'Output must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(Product.objects.order_by('id'), product_rows, output, 'products')
+
+class InStockProductListView(APIView):
+    permission_classes = [AllowAny]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('cursor', OpenApiTypes.STR, description='Opaque cursor from the previous page\'s "next" link.'),
+            OpenApiParameter('page_size', OpenApiTypes.INT, description='Products per page (max 500).'),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    def get(self, request):
+        # Ordered by id only, so pages are read from product_in_stock_idx.
+        pagination = KeysetPagination({'id': ('id',)}, default_ordering='id')
+        products = pagination.paginate_queryset(Product.objects.in_stock(), request, serialize=product_rows.serialize)
+        return Response(pagination.get_paginated_data(products))
+
+class SellerInventoryView(APIView):
+    permission_classes = [IsAuthenticated]
+    low_stock_threshold = 5
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('stock', OpenApiTypes.STR, enum=['in', 'low', 'out'], description='Only products in stock, low on stock or sold out.'),
+            OpenApiParameter('low_stock', OpenApiTypes.INT, description='Highest amount counted as low on stock (default 5).'),
+            OpenApiParameter('cursor', OpenApiTypes.STR, description='Opaque cursor from the previous page\'s "next" link.'),
+            OpenApiParameter('page_size', OpenApiTypes.INT, description='Products per page (max 500).'),
+            OpenApiParameter('ordering', OpenApiTypes.STR, enum=['amount_available', 'id']),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    def get(self, request):
+        products = Product.objects.for_seller(request.user.id)
+
+        stock = request.query_params.get('stock')
+        if stock == 'in':
+            products = products.in_stock()
+        elif stock == 'low':
+            try:
+                threshold = int(request.query_params.get('low_stock', self.low_stock_threshold))
+            except ValueError:
+                return Response({'error': 'Low stock threshold must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+            products = products.low_stock(threshold)
+        elif stock == 'out':
+            products = products.out_of_stock()
+        elif stock is not None:
+            return Response({'error': 'Stock must be one of in, low or out'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The default ordering is read straight from product_seller_stock_idx.
+        pagination = KeysetPagination(
+            {'amount_available': ('amount_available', 'id'), 'id': ('id',)}, default_ordering='amount_available'
+        )
+        products = pagination.paginate_queryset(products, request, serialize=product_rows.serialize)
+        return Response(pagination.get_paginated_data(products))
+
+class ProductSearchView(APIView):
+    permission_classes = [AllowAny]
+    page_size = 20
+    max_page_size = 100
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', OpenApiTypes.STR, required=True, description='Product name, or part of it. Misspellings still match.'),
+            OpenApiParameter('page', OpenApiTypes.INT, description='Page number, starting at 1.'),
+            OpenApiParameter('page_size', OpenApiTypes.INT, description='Products per page (max 100).'),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+        examples=[
+            OpenApiExample(
+                'Search Response',
+                value={
+                    'next': 'http://testserver/api/product/search/?page=2&q=cola',
+                    'results': [{'id': 1, 'product_name': 'Cola', 'amount_available': 10, 'cost': '1.00', 'seller_id': 1}],
+                },
+                response_only=True,
+            ),
+        ],
+    )
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = max(1, min(int(request.query_params.get('page_size', self.page_size)), self.max_page_size))
+        except ValueError:
+            return Response({'error': 'Page and page size must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = search_products(query, page_size + 1, (page - 1) * page_size)
+        next_link = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        return Response({'next': next_link, 'results': results})
 
 class ProductCreationView(APIView):
     permission_classes = [IsAuthenticated]
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from base.models import CustomUser, Product
+
+STOCK_TOPIC = 'stock'
+
+
+def deposit_topic(user_id):
+    return f'deposit:{user_id}'
+
+
+class Subscription:
+    """
+    One subscriber's bounded queue of pending events.
+
+    Events carry a key, and a newer event replaces a pending one with the
+    same key, so a slow reader only ever sees the latest stock or balance.
+    A reader that falls ``maxsize`` distinct keys behind is marked
+    overflowed instead of slowing the publishers down; it should drop the
+    connection and let the client reload.
+    """
+
+    def __init__(self, topics, maxsize, loop):
+        self.topics = topics
+        self.maxsize = maxsize
+        self.loop = loop
+        self.overflowed = False
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._waiter = None
+
+    def offer(self, key, event):
+        """Queue an event; returns False once the subscriber has overflowed."""
+        with self._lock:
+            if self.overflowed:
+                return False
+            if key not in self._pending and len(self._pending) >= self.maxsize:
+                self.overflowed = True
+                self._pending.clear()
+            else:
+                self._pending[key] = event
+            return True
+
+    def wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout=None):
+        """Next event, or None after ``timeout`` seconds or once overflowed."""
+        while True:
+            with self._lock:
+                if self._pending:
+                    key = next(iter(self._pending))
+                    return self._pending.pop(key)
+                if self.overflowed:
+                    return None
+                # A bare future and timer rather than asyncio.wait_for, which
+                # would create a task for every wait of every subscriber.
+                self._waiter = self.loop.create_future()
+            timer = self.loop.call_later(timeout, self.wake) if timeout is not None else None
+            try:
+                await self._waiter
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            if timer is not None and timer.when() <= self.loop.time():
+                with self._lock:
+                    if not self._pending and not self.overflowed:
+                        return None
+
+
+class EventHub:
+    """
+    In-process pub/sub between the sync code that changes stock and
+    balances and the async streams that push them to clients.
+
+    publish() never blocks on subscribers: it queues the event on each
+    subscription and wakes every event loop involved with a single
+    thread-safe callback.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        subscription = Subscription(tuple(topics), self.queue_size, asyncio.get_running_loop())
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def has_subscribers(self, topic):
+        return topic in self._topics
+
+    def publish(self, topic, key, event):
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+
+        woken = {}
+        for subscription in subscribers:
+            if subscription.offer(key, event):
+                woken.setdefault(subscription.loop, []).append(subscription)
+                if subscription.overflowed:
+                    # Stop queueing for it now; its stream ends once it wakes.
+                    self.unsubscribe(subscription)
+        for loop, subscriptions in woken.items():
+            try:
+                loop.call_soon_threadsafe(wake_all, subscriptions)
+            except RuntimeError:
+                # The subscriber's loop has already been closed.
+                pass
+
+
+def wake_all(subscriptions):
+    for subscription in subscriptions:
+        subscription.wake()
+
+
+hub = EventHub()
+
+
+def publish_stock(product_ids):
+    """Push the committed ``amount_available`` of these products to subscribers."""
+    if not hub.has_subscribers(STOCK_TOPIC):
+        return
+    product_ids = list(product_ids)
+
+    def push():
+        levels = Product.objects.filter(id__in=product_ids).values_list('id', 'amount_available')
+        publish_stock_levels(dict(levels))
+
+    transaction.on_commit(push)
+
+
+def publish_stock_levels(levels):
+    """Push stock levels that are already known, such as the hot inventory counters."""
+    for product_id, amount_available in levels.items():
+        event = {'product_id': product_id, 'amount_available': amount_available}
+        hub.publish(STOCK_TOPIC, ('stock', product_id), ('stock', event))
+
+
+def publish_deposit(user_id):
+    """Push the committed deposit of a user to that user's subscribers."""
+    topic = deposit_topic(user_id)
+    if not hub.has_subscribers(topic):
+        return
+
+    def push():
+        deposit = CustomUser.objects.filter(user_id=user_id).values_list('deposit', flat=True).first()
+        if deposit is not None:
+            hub.publish(topic, ('deposit', user_id), ('deposit', {'deposit': str(deposit)}))
+
+    transaction.on_commit(push)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    publish_stock([instance.id])
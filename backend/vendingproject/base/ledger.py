@@ -0,0 +1,78 @@
+"""
+Optional audit log of deposit changes.
+
+CustomUser.deposit stays the balance of record and is still updated in place;
+when BALANCE_LEDGER['ENABLED'] is set every change is also appended here, so
+it can be audited and cross-checked with balance(). That makes each write
+slower, not faster, see benchmarks/ledger.py.
+"""
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from base.models import BalanceEntry, BalanceSnapshot
+from base import events
+
+Kind = BalanceEntry.Kind
+
+
+def enabled():
+    return getattr(settings, 'BALANCE_LEDGER', {}).get('ENABLED', False)
+
+
+def record(user_id, amount, kind):
+    """
+    Announce one balance change and, with the ledger enabled, append it.
+    Callers run it in the transaction that changes the deposit.
+    """
+    events.publish_deposit(user_id)
+    if enabled():
+        return BalanceEntry.objects.create(user_id=user_id, amount=amount, kind=kind)
+
+
+def balance(user_id):
+    """Current balance: the user's snapshot plus the entries recorded after it."""
+    snapshot = BalanceSnapshot.objects.filter(user_id=user_id).values_list('balance', 'last_entry_id').first()
+    snapshot_balance, last_entry_id = snapshot or (Decimal('0.00'), 0)
+
+    tail = BalanceEntry.objects.filter(user_id=user_id, id__gt=last_entry_id).aggregate(total=Sum('amount'))['total']
+    return snapshot_balance + (tail or 0)
+
+
+def compact():
+    """
+    Fold every entry recorded since the last snapshot into the snapshot so
+    balance() only has to sum a short tail. Entries are kept for auditing.
+    Returns the number of snapshots written.
+    """
+    last_snapshot_entry = BalanceSnapshot.objects.filter(user_id=OuterRef('user_id')).values('last_entry_id')
+    tails = (
+        BalanceEntry.objects
+        .filter(id__gt=Coalesce(Subquery(last_snapshot_entry), Value(0)))
+        .values('user_id')
+        .annotate(total=Sum('amount'), last_entry_id=Max('id'))
+    )
+
+    with transaction.atomic():
+        tails = list(tails)
+        snapshots = BalanceSnapshot.objects.in_bulk([tail['user_id'] for tail in tails], field_name='user_id')
+        now = timezone.now()
+
+        created, updated = [], []
+        for tail in tails:
+            snapshot = snapshots.get(tail['user_id'])
+            if snapshot is None:
+                snapshot = BalanceSnapshot(user_id=tail['user_id'], balance=0)
+                created.append(snapshot)
+            else:
+                updated.append(snapshot)
+            snapshot.balance += tail['total']
+            snapshot.last_entry_id = tail['last_entry_id']
+            snapshot.updated_at = now
+
+        BalanceSnapshot.objects.bulk_create(created, batch_size=500)
+        BalanceSnapshot.objects.bulk_update(updated, ['balance', 'last_entry_id', 'updated_at'], batch_size=500)
+
+    return len(created) + len(updated)
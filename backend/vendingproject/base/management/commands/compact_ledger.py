@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from base import ledger
+
+
+class Command(BaseCommand):
+    help = 'Fold new balance ledger entries into per-user snapshots. Run it periodically, e.g. from cron.'
+
+    def handle(self, *args, **options):
+        written = ledger.compact()
+        self.stdout.write(self.style.SUCCESS(f'Compacted ledger into {written} snapshot(s)'))
@@ -0,0 +1,135 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from base import ledger
+from base.models import BalanceEntry, CustomUser, User
+
+
+def read_rows(path, format):
+    with open(path, newline='', encoding='utf-8') as file:
+        if format == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Create users in bulk from a CSV or NDJSON file with username, password and optional role '
+        'and deposit columns. Passwords are hashed in a process pool while the previous chunk is inserted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users per transaction.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Password hashing processes.')
+
+    def handle(self, *args, path, format, chunk_size, workers, **options):
+        if format is None:
+            format = 'csv' if Path(path).suffix.lower() == '.csv' else 'ndjson'
+        self.verbosity = options['verbosity']
+        self.seen = set()
+        self.created = self.skipped = 0
+        self.started = time.perf_counter()
+
+        try:
+            chunks = chunked(self.valid_rows(read_rows(path, format)), chunk_size)
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                # Hash the next chunk in the pool while this process inserts the
+                # previous one, so the database never waits for the hashing.
+                pending = None
+                for chunk in chunks:
+                    passwords = pool.map(make_password, [row['password'] for row in chunk], chunksize=max(1, len(chunk) // (workers * 4)))
+                    if pending is not None:
+                        self.insert(*pending)
+                    pending = chunk, passwords
+                if pending is not None:
+                    self.insert(*pending)
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        except (csv.Error, json.JSONDecodeError) as e:
+            raise CommandError(f'Cannot parse {path}: {e}')
+        except IntegrityError as e:
+            raise CommandError(f'Insert failed after {self.created} user(s): {e}')
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {self.created} user(s), skipped {self.skipped} in {elapsed:.1f}s '
+            f'({self.created / elapsed if elapsed else 0:.0f} users/s)'
+        ))
+
+    def valid_rows(self, rows):
+        for number, row in enumerate(rows, start=1):
+            username = (row.get('username') or '').strip()
+            password = row.get('password') or ''
+            role = row.get('role') or CustomUser.Role.BUYER
+            try:
+                deposit = Decimal(str(row.get('deposit') or 0)).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                deposit = None
+
+            if not username or len(username) > 150 or not password:
+                error = 'username and password are required'
+            elif role not in CustomUser.Role.values:
+                error = f'invalid role {role!r}'
+            elif deposit is None or not 0 <= deposit < 10 ** 8:
+                error = f'invalid deposit {row.get("deposit")!r}'
+            elif username in self.seen:
+                error = f'duplicate username {username!r}'
+            else:
+                self.seen.add(username)
+                yield {'username': username, 'password': password, 'role': role, 'deposit': deposit}
+                continue
+
+            self.skipped += 1
+            self.stderr.write(f'Row {number}: {error}, skipped')
+
+    def insert(self, chunk, passwords):
+        existing = set(User.objects.filter(username__in=[row['username'] for row in chunk]).values_list('username', flat=True))
+        users, rows = [], []
+        for row, password in zip(chunk, passwords):
+            if row['username'] in existing:
+                self.skipped += 1
+                self.stderr.write(f'User {row["username"]!r} already exists, skipped')
+                continue
+            users.append(User(username=row['username'], password=password))
+            rows.append(row)
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            CustomUser.objects.bulk_create(
+                CustomUser(user=user, role=row['role'], deposit=row['deposit']) for user, row in zip(users, rows)
+            )
+            # CustomUser.save would record these; bulk_create skips it.
+            if ledger.enabled():
+                BalanceEntry.objects.bulk_create(
+                    BalanceEntry(user=user, amount=row['deposit'], kind=BalanceEntry.Kind.OPENING)
+                    for user, row in zip(users, rows) if row['deposit']
+                )
+
+        self.created += len(users)
+        if self.verbosity >= 1:
+            elapsed = time.perf_counter() - self.started
+            self.stdout.write(f'{self.created} user(s) created, {self.skipped} skipped ({self.created / elapsed:.0f} users/s)')
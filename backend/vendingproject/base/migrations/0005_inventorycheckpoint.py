@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("base", "0004_alter_customuser_deposit_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("journal_seq", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
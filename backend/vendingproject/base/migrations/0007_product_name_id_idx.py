@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("base", "0006_balance_ledger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["product_name", "id"], name="product_name_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# An external-content FTS5 table over base_product.product_name with the
+# trigram tokenizer (SQLite 3.34+), kept in sync by triggers so bulk inserts
+# and the guarded stock UPDATEs, which skip model signals, are covered too.
+# Stock changes do not touch the index because the update trigger only
+# fires on product_name.
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE base_product_search USING fts5(
+        product_name, content='base_product', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER base_product_search_insert AFTER INSERT ON base_product BEGIN
+        INSERT INTO base_product_search (rowid, product_name) VALUES (new.id, new.product_name);
+    END
+    """,
+    """
+    CREATE TRIGGER base_product_search_delete AFTER DELETE ON base_product BEGIN
+        INSERT INTO base_product_search (base_product_search, rowid, product_name)
+        VALUES ('delete', old.id, old.product_name);
+    END
+    """,
+    """
+    CREATE TRIGGER base_product_search_update AFTER UPDATE OF product_name ON base_product BEGIN
+        INSERT INTO base_product_search (base_product_search, rowid, product_name)
+        VALUES ('delete', old.id, old.product_name);
+        INSERT INTO base_product_search (rowid, product_name) VALUES (new.id, new.product_name);
+    END
+    """,
+    "INSERT INTO base_product_search (base_product_search) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS base_product_search_update",
+    "DROP TRIGGER IF EXISTS base_product_search_delete",
+    "DROP TRIGGER IF EXISTS base_product_search_insert",
+    "DROP TABLE IF EXISTS base_product_search",
+]
+
+
+def run_on_sqlite(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("base", "0007_product_name_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SEARCH_INDEX), run_on_sqlite(DROP_SEARCH_INDEX)
+        ),
+    ]
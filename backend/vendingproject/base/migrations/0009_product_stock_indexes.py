@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("base", "0008_product_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["seller_id", "amount_available"],
+                name="product_seller_stock_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("amount_available__gt", 0)),
+                fields=["id"],
+                name="product_in_stock_idx",
+            ),
+        ),
+    ]
@@ -17,12 +17,31 @@ class CustomUser(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
+        adding = self._state.adding
         super().save(*args, **kwargs)
+
+        # Users created with a balance get an opening ledger entry for it.
+        from base import ledger
+        if adding and self.deposit and ledger.enabled():
+            BalanceEntry.objects.create(user_id=self.user_id, amount=self.deposit, kind=BalanceEntry.Kind.OPENING)
     
     def update(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
 
+class ProductQuerySet(models.QuerySet):
+    def for_seller(self, seller_id):
+        return self.filter(seller_id=seller_id)
+
+    def in_stock(self):
+        return self.filter(amount_available__gt=0)
+
+    def low_stock(self, threshold):
+        return self.filter(amount_available__gt=0, amount_available__lte=threshold)
+
+    def out_of_stock(self):
+        return self.filter(amount_available=0)
+
 class Product(models.Model):
     id = models.AutoField(primary_key=True)
     product_name = models.CharField(max_length=30)
@@ -30,6 +49,18 @@ class Product(models.Model):
     amount_available = models.PositiveIntegerField()
     cost = models.DecimalField(max_digits=10, decimal_places=2)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the catalog ordered by name.
+            models.Index(fields=['product_name', 'id'], name='product_name_id_idx'),
+            # A seller's products by stock level.
+            models.Index(fields=['seller_id', 'amount_available'], name='product_seller_stock_idx'),
+            # Only in-stock rows, for paging the in-stock catalog by id.
+            models.Index(fields=['id'], condition=models.Q(amount_available__gt=0), name='product_in_stock_idx'),
+        ]
+
     def clean(self):
         if self.cost*100 % 5 != 0:
             raise ValidationError('Cost must be in multiples of 5 cents.')
@@ -38,4 +69,29 @@ class Product(models.Model):
         self.full_clean()
         super().save(*args, **kwargs)
 
+class InventoryCheckpoint(models.Model):
+    # Last hot inventory journal entry already applied to Product rows.
+    journal_seq = models.PositiveBigIntegerField(default=0)
+
+class BalanceEntry(models.Model):
+    """Append-only record of one change to a user's deposit."""
+
+    class Kind(models.TextChoices):
+        OPENING = 'opening'
+        DEPOSIT = 'deposit'
+        PURCHASE = 'purchase'
+        RESET = 'reset'
+        ADJUSTMENT = 'adjustment'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='balance_entries')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class BalanceSnapshot(models.Model):
+    """Balance of a user up to and including ``last_entry_id``."""
 
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='balance_snapshot')
+    balance = models.DecimalField(default=0, max_digits=10, decimal_places=2)
+    last_entry_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -1,11 +1,46 @@
-from django.test import TestCase
+from django.conf import settings
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from base.models import User, CustomUser, Product
+from base.models import User, CustomUser, Product, BalanceEntry, BalanceSnapshot
+from base import ledger
 from decimal import Decimal
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.cache import cache
+from datetime import timedelta
+from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from api.tokens import RoleRefreshToken, StreamToken, blacklist_user_tokens
+from api.purchases import purchase_product, checkout_cart, credit_deposit, reset_deposit, InsufficientStock, InsufficientDeposit
+from api.inventory import HotInventory
+from api.change import change_table, ChangeTable, COINS
+from api.idempotency import idempotency_cache_key
+from api.pagination import KeysetPagination
+from api.catalog import catalog_cache
+from api.hashing import HashingPool, hashing_pool
+from api.sessions import SessionRegistry, session_registry
+from api.sharedcache import SharedMemoryCache, ValueTooLarge, CacheFull, DIRTY
+from api.blacklist import BloomFilter, BlacklistFilter
+from api.tokencache import VerifiedTokenCache, verified_tokens
+from api.streams import sse_events, event_stream
+from api.authentication import authenticate_request
+from base.events import EventHub, STOCK_TOPIC, deposit_topic, hub
+from api.serializers import UserSerializer, ProductSerializer, user_rows, user_export_rows, product_rows
+from rest_framework.renderers import JSONRenderer
+from django.core.cache import cache, caches
+from rest_framework_simplejwt.backends import TokenBackend
+from unittest import mock
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
 
 class UserRegistrationAndListViewTests(TestCase):
     def setUp(self):
@@ -49,7 +84,37 @@ class UserRegistrationAndListViewTests(TestCase):
         User.objects.create_user(username='user2', password='pass123')
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.json()), 2)
+
+    def create_users(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'user{i:02d}', password='pass123')
+            CustomUser.objects.create(user=user, role='seller' if i % 3 == 0 else 'buyer', deposit=i)
+
+    def test_user_list_is_one_query(self):
+        self.create_users(12)
+        for params in ({}, {'page_size': 2}, {'page_size': 10}, {'role': 'seller'}):
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_list_pages(self):
+        self.create_users(5)
+        usernames = []
+        response = self.client.get(self.url, {'page_size': 2, 'ordering': 'username'})
+        while True:
+            usernames += [user['username'] for user in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(usernames, [f'user{i:02d}' for i in range(5)])
+
+    def test_user_list_role_filter(self):
+        self.create_users(6)
+        response = self.client.get(self.url, {'role': 'seller'})
+        self.assertEqual([user['username'] for user in response.json()], ['user00', 'user03'])
+        response = self.client.get(self.url, {'role': 'admin'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 class UserDetailManagementViewTests(TestCase):
     def setUp(self):
@@ -82,6 +147,19 @@ class UserDetailManagementViewTests(TestCase):
         self.user.refresh_from_db()
         self.assertTrue(self.user.check_password('newpassword123'))
 
+    def test_role_update_keeps_concurrent_debit(self):
+        CustomUser.objects.filter(user=self.user).update(deposit=100)
+        instance = User.objects.select_related('customuser').get(id=self.user.id)
+        # A purchase lands between loading the user and saving the update.
+        CustomUser.objects.filter(user=self.user).update(deposit=40)
+        serializer = UserSerializer(instance, data={'role': 'seller'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.user.customuser.role, 'seller')
+        self.assertEqual(self.user.customuser.deposit, 40)
+        self.assertEqual(serializer.data['deposit'], 40)
+
     def test_delete_user(self):
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
@@ -168,6 +246,33 @@ class UserDepositViewTests(TestCase):
         self.user.customuser.refresh_from_db()
         self.assertEqual(self.user.customuser.deposit, Decimal('1'))
     
+    def test_batch_deposit(self):
+        access_token = RoleRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        data = {'coins': ['0.50', '0.20', '0.30', 'abc', 1]}
+        # Authenticate, then one update for all coins (plus the savepoint
+        # queries of the transaction inside the test).
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deposited'], Decimal('1.70'))
+        self.assertEqual([coin['accepted'] for coin in response.data['coins']], [True, True, False, False, True])
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.user.customuser.deposit, Decimal('1.70'))
+
+    def test_batch_deposit_requires_coins(self):
+        response = self.client.post(self.url, {'coins': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_deposit_all_coins_rejected(self):
+        access_token = RoleRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        response = self.client.post(self.url, {'coins': ['0.30', 'abc']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([coin['accepted'] for coin in response.data['coins']], [False, False])
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.user.customuser.deposit, Decimal('0'))
+
     def test_invalid_deposit_amount(self):
         data = {'amount': 0.3}
         response = self.client.post(self.url, data)
@@ -248,7 +353,7 @@ class ProductListViewTests(TestCase):
     def test_list_products(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.json()), 2)
 
 class ProductCreationViewTests(TestCase):
     def setUp(self):
@@ -327,3 +432,1188 @@ class ProductUpdateDeleteViewTests(TestCase):
         data = {'product_name': 'Updated Product', 'cost': 10}
         response = self.client.put(url, data)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='seller', password='sellerpass123')
+        CustomUser.objects.create(user=self.user, role='seller')
+        self.product = Product.objects.create(product_name='Test Product', seller_id=self.user, amount_available=10, cost=5)
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_token_verified_once_per_request(self):
+        url = reverse('product_detail', kwargs={'id': self.product.id})
+        with mock.patch.object(TokenBackend, 'decode', autospec=True, side_effect=TokenBackend.decode) as decode:
+            response = self.client.put(url, {'cost': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_invalid_token_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        url = reverse('product_detail', kwargs={'id': self.product.id})
+        response = self.client.put(url, {'cost': 10})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class VerifiedTokenCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='kiosk', password='kioskpass123')
+        CustomUser.objects.create(user=self.user, role='buyer')
+        self.access_token = str(RoleRefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+    def test_repeated_token_verified_once(self):
+        with mock.patch.object(TokenBackend, 'decode', autospec=True, side_effect=TokenBackend.decode) as decode:
+            for _ in range(3):
+                response = self.client.get(reverse('active_sessions'))
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_bounded_and_expiring(self):
+        tokens = VerifiedTokenCache(max_entries=2)
+        access = [RoleRefreshToken.for_user(self.user).access_token for _ in range(3)]
+        for token in access:
+            tokens.put(str(token), token)
+        self.assertIsNone(tokens.get(str(access[0])))
+        self.assertIs(tokens.get(str(access[2])), access[2])
+        self.assertIsNone(tokens.get(str(access[2]), now=access[2]['exp']))
+
+    def test_logout_evicts(self):
+        self.client.get(reverse('active_sessions'))
+        self.assertIsNotNone(verified_tokens.get(self.access_token))
+        response = self.client.post(reverse('logout_all'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(verified_tokens.get(self.access_token))
+
+    def test_evict_user_with_string_claim(self):
+        tokens = VerifiedTokenCache()
+        token = RoleRefreshToken.for_user(self.user).access_token
+        token['user_id'] = str(self.user.id)
+        tokens.put(str(token), token)
+        tokens.evict_user(self.user.id)
+        self.assertIsNone(tokens.get(str(token)))
+
+class RoleClaimTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        CustomUser.objects.create(user=self.user, role='seller')
+
+    def tearDown(self):
+        caches['revocations'].clear()
+
+    def test_signin_token_carries_role(self):
+        response = self.client.post(reverse('signin'), {'username': 'testuser', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'seller')
+
+        response = self.client.post(reverse('refresh'), {'refresh': response.data['refresh']})
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'seller')
+
+    def test_role_gating_without_queries(self):
+        access_token = RoleRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('buy'), {'product_id': 1, 'quantity': 1})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_role_change_revokes_tokens(self):
+        refresh = RoleRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        url = reverse('user_detail', kwargs={'id': self.user.id})
+
+        # Same second as the token: only the sub-second claim tells them apart.
+        with mock.patch('rest_framework_simplejwt.tokens.aware_utcnow', return_value=refresh.current_time):
+            response = self.client.put(url, {'role': 'buyer'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            reissued = RoleRefreshToken.for_user(User.objects.get(id=self.user.id))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse('refresh'), {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.assertEqual(reissued['iat'], refresh['iat'])
+        self.assertEqual(reissued['role'], 'buyer')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {reissued.access_token}')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class RoutePolicyMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        CustomUser.objects.create(user=self.user, role='buyer')
+        access_token = RoleRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def test_policy_keyed_by_url_name(self):
+        # product/get/ contains 'product/' but has no seller policy.
+        response = self.client.post(reverse('product_get'))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        response = self.client.post(reverse('product'), {'product_name': 'New Product'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_other_user_cannot_modify_user(self):
+        url = reverse('user_detail', kwargs={'id': self.user.id + 1})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class PurchaseEngineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        CustomUser.objects.create(user=self.user, deposit=12)
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        self.product = Product.objects.create(product_name='Test Product', seller_id=self.seller, amount_available=3, cost=5)
+
+    def test_purchase_uses_guarded_updates(self):
+        result = purchase_product(self.user.id, self.product.id, 2)
+        self.assertEqual(result, {'total_price': Decimal('10.00'), 'product_name': 'Test Product', 'change': Decimal('2.00')})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 1)
+
+    def test_stock_never_oversold(self):
+        purchase_product(self.user.id, self.product.id, 2)
+        with self.assertRaises(InsufficientStock):
+            purchase_product(self.user.id, self.product.id, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 1)
+
+    def test_insufficient_deposit_rolls_back_stock(self):
+        with self.assertRaises(InsufficientDeposit):
+            purchase_product(self.user.id, self.product.id, 3)
+        self.product.refresh_from_db()
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 3)
+        self.assertEqual(self.user.customuser.deposit, Decimal('12'))
+
+class CartCheckoutViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('buy_cart')
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        CustomUser.objects.create(user=self.user, deposit=20)
+
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        self.product1 = Product.objects.create(product_name='Product 1', seller_id=self.seller, amount_available=10, cost=5)
+        self.product2 = Product.objects.create(product_name='Product 2', seller_id=self.seller, amount_available=1, cost='2.50')
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_checkout_success(self):
+        items = [{'product_id': self.product1.id, 'quantity': 2}, {'product_id': self.product2.id, 'quantity': 1}]
+        response = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_price'], Decimal('12.50'))
+        self.assertEqual(response.data['change'], Decimal('7.50'))
+        self.assertEqual(len(response.data['items']), 2)
+        self.product1.refresh_from_db()
+        self.product2.refresh_from_db()
+        self.assertEqual((self.product1.amount_available, self.product2.amount_available), (8, 0))
+
+    def test_checkout_fails_as_a_unit(self):
+        items = [{'product_id': self.product1.id, 'quantity': 2}, {'product_id': self.product2.id, 'quantity': 2}]
+        response = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Insufficient stock', str(response.data))
+        self.product1.refresh_from_db()
+        self.assertEqual(self.product1.amount_available, 10)
+
+    def test_checkout_insufficient_deposit_rolls_back(self):
+        items = [{'product_id': self.product1.id, 'quantity': 4}, {'product_id': self.product2.id, 'quantity': 1}]
+        response = self.client.post(self.url, {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Insufficient deposit', str(response.data))
+        self.product2.refresh_from_db()
+        self.assertEqual(self.product2.amount_available, 1)
+
+    def test_checkout_unknown_product(self):
+        response = self.client.post(self.url, {'items': [{'product_id': 9999, 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_checkout_requires_items(self):
+        response = self.client.post(self.url, {'items': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class HotInventoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        CustomUser.objects.create(user=self.user, deposit=20)
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        self.product = Product.objects.create(product_name='Hot Product', seller_id=self.seller, amount_available=5, cost=1)
+
+        self.journal_path = os.path.join(tempfile.mkdtemp(), 'hot_inventory.journal')
+        self.inventory = HotInventory([self.product.id], self.journal_path, batch_size=3, flush_interval=60)
+        patcher = mock.patch('api.purchases.hot_inventory', self.inventory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_purchases_flushed_in_batches(self):
+        purchase_product(self.user.id, self.product.id, 1)
+        purchase_product(self.user.id, self.product.id, 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 5)
+        self.assertEqual(self.inventory.available(self.product.id), 3)
+
+        purchase_product(self.user.id, self.product.id, 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 2)
+
+    def test_counter_prevents_oversell(self):
+        purchase_product(self.user.id, self.product.id, 4)
+        with self.assertRaises(InsufficientStock):
+            purchase_product(self.user.id, self.product.id, 2)
+
+    def test_failed_deposit_releases_units(self):
+        expensive = Product.objects.create(product_name='Cold Product', seller_id=self.seller, amount_available=5, cost=30)
+        with self.assertRaises(InsufficientDeposit):
+            checkout_cart(self.user.id, [(self.product.id, 2), (expensive.id, 1)])
+        self.assertEqual(self.inventory.available(self.product.id), 5)
+
+    def test_journal_replayed_after_crash(self):
+        purchase_product(self.user.id, self.product.id, 2)
+        self.inventory._journal.close()
+
+        # A new process finds the unflushed reservation in the journal.
+        recovered = HotInventory([self.product.id], self.journal_path)
+        self.assertEqual(recovered.available(self.product.id), 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 3)
+
+        # Replaying again must not apply the entry twice.
+        recovered._journal.close()
+        with open(self.journal_path, 'w') as journal:
+            journal.write('1 %d 2\n' % self.product.id)
+        self.assertEqual(HotInventory([self.product.id], self.journal_path).available(self.product.id), 3)
+
+    def test_form_and_json_purchases_share_the_counter(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(self.user).access_token}')
+        url = reverse('buy')
+        response = client.post(url, {'product_id': self.product.id, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Form data carries the product ID as a string.
+        response = client.post(url, {'product_id': self.product.id, 'quantity': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = client.post(url, {'product_id': self.product.id, 'quantity': 4}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.inventory.available(self.product.id), 0)
+
+        self.inventory.flush()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 0)
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.user.customuser.deposit, 15)
+
+    def test_uncommitted_reservation_not_replayed(self):
+        self.assertIsNotNone(self.inventory.reserve(self.product.id, 2))
+        self.inventory._journal.close()
+
+        # The process died before the buyer was debited: no sale to replay.
+        recovered = HotInventory([self.product.id], self.journal_path)
+        self.assertEqual(recovered.available(self.product.id), 5)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 5)
+
+    def test_flush_keeps_reservations_in_flight(self):
+        self.inventory.reserve(self.product.id, 2)
+        purchase_product(self.user.id, self.product.id, 1)
+        self.inventory.flush()
+        self.assertEqual(self.inventory.available(self.product.id), 2)
+
+class ChangeTableTests(TestCase):
+    def test_breakdown_uses_fewest_coins(self):
+        self.assertEqual(change_table.breakdown(385), {100: 3, 50: 1, 20: 1, 10: 1, 5: 1})
+        self.assertEqual(change_table.breakdown(0), {})
+        self.assertIsNone(change_table.breakdown(3))
+
+    def test_breakdown_above_table_limit(self):
+        cents = change_table.limit * 100 + 35
+        coins = change_table.breakdown(cents)
+        self.assertEqual(sum(coin * count for coin, count in coins.items()), cents)
+        self.assertEqual(coins[20] + coins[10] + coins[5], 3)
+
+    def test_breakdown_matches_brute_force(self):
+        table = ChangeTable(limit=200)
+        fewest = [0]
+        for cents in range(1, 3001):
+            options = [fewest[cents - coin] for coin in COINS if coin <= cents and fewest[cents - coin] is not None]
+            fewest.append(min(options) + 1 if options else None)
+
+        for cents in range(0, 3001, 5):
+            coins = table.breakdown(cents)
+            self.assertEqual(sum(coin * count for coin, count in coins.items()), cents)
+            self.assertEqual(sum(coins.values()), fewest[cents])
+
+    def test_purchase_and_reset_return_coins(self):
+        client = APIClient()
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        CustomUser.objects.create(user=user, deposit='3.85')
+        seller = User.objects.create_user(username='seller', password='sellerpass123')
+        product = Product.objects.create(product_name='Test Product', seller_id=seller, amount_available=10, cost='1.15')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        response = client.post(reverse('buy'), {'product_id': product.id, 'quantity': 1})
+        self.assertEqual(response.data['coins'], {100: 2, 50: 1, 20: 1})
+
+        response = client.post(reverse('reset'))
+        self.assertEqual(response.data['change'], Decimal('2.70'))
+        self.assertEqual(response.data['coins'], {100: 2, 50: 1, 20: 1})
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        CustomUser.objects.create(user=self.user, deposit=10)
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        self.product = Product.objects.create(product_name='Test Product', seller_id=self.seller, amount_available=10, cost=1)
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def tearDown(self):
+        caches['idempotency'].clear()
+
+    def test_deposit_retry_credited_once(self):
+        first = self.client.post(reverse('deposit'), {'amount': '0.50'}, HTTP_IDEMPOTENCY_KEY='coin-1')
+        retry = self.client.post(reverse('deposit'), {'amount': '0.50'}, HTTP_IDEMPOTENCY_KEY='coin-1')
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+        self.client.post(reverse('deposit'), {'amount': '0.50'}, HTTP_IDEMPOTENCY_KEY='coin-2')
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.user.customuser.deposit, Decimal('11.00'))
+
+    def test_purchase_replay_skips_database(self):
+        data = {'product_id': self.product.id, 'quantity': 1}
+        first = self.client.post(reverse('buy'), data, HTTP_IDEMPOTENCY_KEY='buy-1')
+        with mock.patch('api.views.purchase_product') as purchase:
+            retry = self.client.post(reverse('buy'), data, HTTP_IDEMPOTENCY_KEY='buy-1')
+        purchase.assert_not_called()
+        self.assertEqual(retry.data, first.data)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 9)
+
+    def test_key_reused_with_different_body(self):
+        self.client.post(reverse('deposit'), {'amount': '0.50'}, HTTP_IDEMPOTENCY_KEY='coin-1')
+        response = self.client.post(reverse('deposit'), {'amount': '1.00'}, HTTP_IDEMPOTENCY_KEY='coin-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_concurrent_duplicate_waits_for_first(self):
+        # Simulate the first request still running, then finishing while we wait.
+        self.client.post(reverse('deposit'), {'amount': '0.50'}, HTTP_IDEMPOTENCY_KEY='coin-1')
+        idempotency_cache = caches['idempotency']
+        cache_key = idempotency_cache_key(self.user.id, reverse('deposit'), 'coin-1')
+        stored = idempotency_cache.get(cache_key)
+        idempotency_cache.set(cache_key, 'in-flight')
+
+        with mock.patch('api.idempotency.time.sleep', side_effect=lambda _: idempotency_cache.set(cache_key, stored)) as sleep:
+            response = self.client.post(reverse('deposit'), {'amount': '0.50'}, HTTP_IDEMPOTENCY_KEY='coin-1')
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.user.customuser.deposit, Decimal('10.50'))
+
+    def test_response_too_large_to_store_keeps_key_claimed(self):
+        data = {'product_id': self.product.id, 'quantity': 1}
+        with mock.patch('api.views.change_coins', return_value={'filler': 'x' * 10000}):
+            first = self.client.post(reverse('buy'), data, HTTP_IDEMPOTENCY_KEY='buy-1')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        retry = self.client.post(reverse('buy'), data, HTTP_IDEMPOTENCY_KEY='buy-1')
+        self.assertEqual(retry.status_code, status.HTTP_409_CONFLICT)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.amount_available, 9)
+
+@override_settings(BALANCE_LEDGER={'ENABLED': True})
+class BalanceLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        CustomUser.objects.create(user=self.user, deposit=10)
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        self.product = Product.objects.create(product_name='Test Product', seller_id=self.seller, amount_available=10, cost='1.50')
+
+    def assertLedgerMatchesDeposit(self):
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(ledger.balance(self.user.id), self.user.customuser.deposit)
+
+    def test_every_balance_change_is_recorded(self):
+        credit_deposit(self.user.id, Decimal('0.50'))
+        purchase_product(self.user.id, self.product.id, 2)
+        self.assertLedgerMatchesDeposit()
+        reset_deposit(self.user.id)
+        self.assertLedgerMatchesDeposit()
+
+        kinds = list(BalanceEntry.objects.filter(user=self.user).order_by('id').values_list('kind', flat=True))
+        self.assertEqual(kinds, ['opening', 'deposit', 'purchase', 'reset'])
+
+    def test_compaction_keeps_balance(self):
+        credit_deposit(self.user.id, Decimal('1.00'))
+        self.assertEqual(ledger.compact(), 1)
+        self.assertEqual(BalanceSnapshot.objects.get(user=self.user).balance, Decimal('11.00'))
+        self.assertLedgerMatchesDeposit()
+
+        purchase_product(self.user.id, self.product.id, 1)
+        self.assertLedgerMatchesDeposit()
+        self.assertEqual(ledger.compact(), 1)
+        self.assertEqual(ledger.compact(), 0)
+        self.assertLedgerMatchesDeposit()
+
+    @override_settings(BALANCE_LEDGER={'ENABLED': False})
+    def test_disabled_ledger_records_nothing(self):
+        credit_deposit(self.user.id, Decimal('0.50'))
+        purchase_product(self.user.id, self.product.id, 1)
+        self.assertFalse(BalanceEntry.objects.filter(user=self.user).exclude(kind='opening').exists())
+        self.user.customuser.refresh_from_db()
+        self.assertEqual(self.user.customuser.deposit, Decimal('9.00'))
+
+    def test_compact_ledger_command(self):
+        out = StringIO()
+        call_command('compact_ledger', stdout=out)
+        self.assertIn('1 snapshot(s)', out.getvalue())
+
+class HashingPoolTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        User.objects.create_user(username='buyer', password='buyerpass123')
+
+    def test_signin_uses_pool(self):
+        with mock.patch.object(hashing_pool, 'run', wraps=hashing_pool.run) as run:
+            response = self.client.post(reverse('signin'), {'username': 'buyer', 'password': 'buyerpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(run.call_count, 1)
+
+    def test_over_capacity_fails_fast(self):
+        pool = HashingPool(workers=1, max_pending=1, retry_after=3)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_hash(*args):
+            started.set()
+            release.wait()
+            return True
+
+        thread = threading.Thread(target=pool.run, args=(slow_hash,))
+        thread.start()
+        started.wait()
+        try:
+            with mock.patch('api.views.hashing_pool', pool):
+                signin = self.client.post(reverse('signin'), {'username': 'buyer', 'password': 'buyerpass123'})
+                register = self.client.post(reverse('user'), {'username': 'new', 'password': 'newpass123', 'role': 'buyer'})
+        finally:
+            release.set()
+            thread.join()
+
+        for response in (signin, register):
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '3')
+        self.assertFalse(User.objects.filter(username='new').exists())
+        self.assertTrue(pool.run(lambda: True))
+
+class SessionRegistryTests(TestCase):
+    def setUp(self):
+        session_registry.cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='kiosk', password='kioskpass123')
+
+    def signin(self):
+        response = self.client.post(reverse('signin'), {'username': 'kiosk', 'password': 'kioskpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def active_sessions(self):
+        return self.client.get(reverse('active_sessions')).data['active_sessions']
+
+    def test_logout_removes_its_session(self):
+        first, second = self.signin(), self.signin()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {second["access"]}')
+        self.assertEqual(self.active_sessions(), 2)
+
+        response = self.client.post(reverse('logout'), {'refresh_token': first['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.active_sessions(), 1)
+        # Logging out twice must not count the session off again.
+        self.client.post(reverse('logout'), {'refresh_token': first['refresh']})
+        self.assertEqual(self.active_sessions(), 1)
+
+    def test_logout_all_blacklists_every_session(self):
+        sessions = [self.signin() for _ in range(3)]
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {sessions[0]["access"]}')
+
+        response = self.client.post(reverse('logout_all'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.active_sessions(), 0)
+        for session in sessions:
+            response = self.client.post(reverse('refresh'), {'refresh': session['refresh']})
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_all_bulk_blacklists_many_sessions(self):
+        tokens = [RefreshToken() for _ in range(1000)]
+        for token in tokens:
+            token['user_id'] = self.user.id
+        OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=self.user, jti=token['jti'], token=str(token), expires_at=token.current_time + timedelta(days=1))
+            for token in tokens
+        ])
+        for token in tokens:
+            session_registry.add(token)
+        self.assertEqual(session_registry.count(self.user.id), 1000)
+
+        # Savepoint, one SELECT, the INSERT in SQLite's batches of 499 rows,
+        # release. Timings are in benchmarks/logout_all.py.
+        with self.assertNumQueries(6):
+            blacklist_user_tokens(self.user.id)
+        self.assertEqual(BlacklistedToken.objects.filter(token__user=self.user).count(), 1000)
+        self.assertEqual(session_registry.count(self.user.id), 0)
+        with self.assertNumQueries(3):
+            blacklist_user_tokens(self.user.id)
+
+    def test_expired_sessions_drop_out_of_count(self):
+        registry = SessionRegistry(bucket_seconds=60)
+        now = int(time.time())
+        short = RefreshToken.for_user(self.user)
+        short.set_exp(lifetime=timedelta(minutes=5))
+        self.assertTrue(registry.add(short, now=now))
+        self.assertTrue(registry.add(RefreshToken.for_user(self.user), now=now))
+        self.assertFalse(registry.add(short, now=now))
+
+        self.assertEqual(registry.count(self.user.id, now=now), 2)
+        self.assertEqual(registry.count(self.user.id, now=now + 6 * 60 + 60), 1)
+
+    def test_count_reads_fixed_number_of_keys(self):
+        for _ in range(50):
+            session_registry.add(RefreshToken.for_user(self.user))
+        sessions_cache = session_registry.cache
+        with mock.patch.object(sessions_cache, 'get_many', wraps=sessions_cache.get_many) as get_many:
+            self.assertEqual(session_registry.count(self.user.id), 50)
+        keys = get_many.call_args.args[0]
+        self.assertEqual(len(keys), len(session_registry.live_buckets(self.user.id, int(time.time()))))
+        self.assertLessEqual(len(keys), 24 * 60 * 60 // session_registry.bucket_seconds + 1)
+
+class TokenBlacklistFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='kiosk', password='kioskpass123')
+
+    def signin(self):
+        response = self.client.post(reverse('signin'), {'username': 'kiosk', 'password': 'kioskpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_bloom_filter_false_positive_rate(self):
+        bloom = BloomFilter(10000, 0.01)
+        added = [uuid.uuid4().hex for _ in range(10000)]
+        for jti in added:
+            bloom.add(jti)
+        self.assertTrue(all(jti in bloom for jti in added))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def loaded_filter(self, capacity=100):
+        loaded = BlacklistFilter(capacity=capacity)
+        loaded.load()
+        for target in ('api.tokens.blacklist_filter', 'api.blacklist.blacklist_filter'):
+            patcher = mock.patch(target, loaded)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return loaded
+
+    def test_refresh_without_blacklist_query(self):
+        self.loaded_filter()
+        refresh = self.signin()['refresh']
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_database_answers_until_loaded(self):
+        unloaded = BlacklistFilter(capacity=100)
+        with self.assertNumQueries(0):
+            self.assertTrue(unloaded.might_contain(uuid.uuid4().hex))
+
+        with mock.patch.object(unloaded, 'load') as load:
+            unloaded.start()
+            unloaded._loader.join()
+        load.assert_called_once_with()
+
+    def test_blacklisted_token_is_rejected(self):
+        self.loaded_filter()
+        session = self.signin()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {session["access"]}')
+        self.client.post(reverse('logout'), {'refresh_token': session['refresh']})
+        response = self.client.post(reverse('refresh'), {'refresh': session['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_worker_picks_up_blacklist(self):
+        other_worker = BlacklistFilter(capacity=100)
+        other_worker.load()
+        jti = RefreshToken(self.signin()['refresh'])['jti']
+        self.assertFalse(other_worker.might_contain(jti))
+        with self.captureOnCommitCallbacks(execute=True):
+            blacklist_user_tokens(self.user.id)
+        self.assertTrue(other_worker.might_contain(jti))
+
+    def test_outgrown_filter_rebuilt_in_background(self):
+        loaded = self.loaded_filter(capacity=1)
+        jtis = [RefreshToken(self.signin()['refresh'])['jti'] for _ in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            blacklist_user_tokens(self.user.id)
+
+        # The outgrown filter keeps answering while the new one loads.
+        with mock.patch.object(loaded, 'load') as load:
+            self.assertTrue(all(loaded.might_contain(jti) for jti in jtis))
+            loaded._loader.join()
+        load.assert_called_once_with()
+
+def incr_shared(path, times):
+    shared = SharedMemoryCache(path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+    for _ in range(times):
+        shared.incr('counter')
+
+class SharedMemoryCacheTests(TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.cache')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def shared(self, max_entries=10, item_size=256):
+        return SharedMemoryCache(self.path, {'OPTIONS': {'MAX_ENTRIES': max_entries, 'ITEM_SIZE': item_size}})
+
+    def test_basic_operations(self):
+        shared = self.shared()
+        self.assertTrue(shared.add('key', {'a': 1}))
+        self.assertFalse(shared.add('key', 'other'))
+        self.assertEqual(shared.get('key'), {'a': 1})
+        shared.set('count', 5)
+        self.assertEqual(shared.incr('count', 3), 8)
+        self.assertEqual(shared.decr('count'), 7)
+        self.assertEqual(shared.get_many(['key', 'count', 'missing']), {'key': {'a': 1}, 'count': 7})
+        with self.assertRaises(ValueError):
+            shared.incr('missing')
+        self.assertTrue(shared.delete('key'))
+        self.assertFalse(shared.delete('key'))
+        shared.clear()
+        self.assertIsNone(shared.get('count'))
+
+    def test_expiry(self):
+        shared = self.shared()
+        now = time.time()
+        shared.set('short', 1, timeout=10)
+        shared.set('forever', 2, timeout=None)
+        with mock.patch('api.sharedcache.time.time', return_value=now + 11):
+            self.assertIsNone(shared.get('short'))
+            self.assertEqual(shared.get('forever'), 2)
+        self.assertTrue(shared.touch('forever', timeout=10))
+        with mock.patch('api.sharedcache.time.time', return_value=now + 11):
+            self.assertFalse(shared.has_key('forever'))
+        shared.set('gone', 1, timeout=0)
+        self.assertFalse(shared.has_key('gone'))
+
+    def test_evicts_least_recently_used(self):
+        shared = self.shared(max_entries=3)
+        for key in 'abc':
+            shared.set(key, key)
+        shared.get('a')
+        shared.set('d', 'd')
+        self.assertEqual(shared.get_many(['a', 'b', 'c', 'd']), {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_oversized_values_raise(self):
+        shared = self.shared(item_size=64)
+        shared.set('key', 'small')
+        with self.assertRaises(ValueTooLarge):
+            shared.set('key', 'x' * 100)
+        self.assertEqual(shared.get('key'), 'small')
+        with self.assertRaises(ValueTooLarge):
+            shared.add('other', 'x' * 100)
+        self.assertEqual(shared.set_many({'other': 'x' * 100, 'fits': 1}), ['other'])
+        self.assertEqual(shared.get_many(['other', 'fits']), {'fits': 1})
+
+    def test_recovers_entries_after_interrupted_change(self):
+        shared = self.shared()
+        shared.set('kept', 'value')
+        shared.set('torn', 'torn-value-marker')
+        with open(self.path, 'r+b') as file:
+            data = file.read()
+            # A worker killed while writing 'torn', before it could clear DIRTY.
+            file.seek(data.index(b'torn-value-marker'))
+            file.write(b'x')
+            file.seek(DIRTY)
+            file.write(b'\x01')
+
+        self.assertEqual(shared.get('kept'), 'value')
+        self.assertIsNone(shared.get('torn'))
+        shared.set('new', 1)
+        self.assertEqual(shared.get_many(['kept', 'new']), {'kept': 'value', 'new': 1})
+
+    def test_non_evicting_cache_refuses_new_keys_when_full(self):
+        shared = SharedMemoryCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 2, 'EVICT': False}})
+        shared.set('a', 1)
+        shared.set('b', 2, timeout=10)
+        with self.assertRaises(CacheFull):
+            shared.set('c', 3)
+        shared.set('a', 4)
+        self.assertEqual(shared.get_many(['a', 'b', 'c']), {'a': 4, 'b': 2})
+
+        # Expired entries make room.
+        with mock.patch('api.sharedcache.time.time', return_value=time.time() + 11):
+            shared.set('c', 3)
+        self.assertEqual(shared.get_many(['a', 'b', 'c']), {'a': 4, 'c': 3})
+
+    def test_tests_use_their_own_cache_files(self):
+        for alias in ('default', 'idempotency', 'revocations', 'sessions'):
+            self.assertNotEqual(os.path.dirname(caches[alias].path), str(settings.SHARED_CACHE_DIR))
+            self.assertTrue(os.path.basename(caches[alias].path).startswith(f'{settings.SHARED_CACHE_NAME}-'))
+
+    def test_shared_between_instances(self):
+        self.shared().set('key', 'value')
+        self.assertEqual(self.shared().get('key'), 'value')
+
+    def test_incr_is_atomic_across_processes(self):
+        shared = SharedMemoryCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        shared.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=incr_shared, args=(self.path, 200)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(shared.get('counter'), 800)
+
+class ProvisionUsersCommandTests(TestCase):
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def provision(self, path):
+        out, err = StringIO(), StringIO()
+        call_command('provision_users', path, '--workers', '2', '--chunk-size', '2', stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    @override_settings(BALANCE_LEDGER={'ENABLED': True})
+    def test_csv(self):
+        User.objects.create_user(username='existing', password='pass123')
+        path = self.write('.csv', (
+            'username,password,role,deposit\n'
+            'kiosk1,secret1,buyer,1.50\n'
+            'kiosk2,secret2,seller,\n'
+            'kiosk1,again,buyer,0\n'
+            'kiosk3,secret3,admin,0\n'
+            'existing,secret4,buyer,0\n'
+        ))
+        out, err = self.provision(path)
+
+        self.assertIn('Created 2 user(s), skipped 3', out)
+        self.assertIn("duplicate username 'kiosk1'", err)
+        self.assertIn("invalid role 'admin'", err)
+        self.assertIn("'existing' already exists", err)
+
+        kiosk1 = User.objects.get(username='kiosk1')
+        self.assertTrue(kiosk1.check_password('secret1'))
+        self.assertEqual((kiosk1.customuser.role, kiosk1.customuser.deposit), ('buyer', Decimal('1.50')))
+        self.assertEqual(User.objects.get(username='kiosk2').customuser.role, 'seller')
+        self.assertEqual(ledger.balance(kiosk1.id), Decimal('1.50'))
+
+    def test_ndjson(self):
+        path = self.write('.ndjson', '{"username": "kiosk1", "password": "secret1"}\n\n{"username": "kiosk2", "password": "secret2", "deposit": 2}\n')
+        self.provision(path)
+        self.assertEqual(CustomUser.objects.filter(user__username__startswith='kiosk', role='buyer').count(), 2)
+        self.assertEqual(User.objects.get(username='kiosk2').customuser.deposit, Decimal('2.00'))
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            self.provision('/nonexistent/users.csv')
+
+class ProductKeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('product_get')
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        for name in ['Cola', 'Apple', 'Water', 'Apple', 'Chips']:
+            Product.objects.create(product_name=name, seller_id=self.seller, amount_available=10, cost=5)
+
+    def collect(self, params):
+        names, pages = [], 0
+        response = self.client.get(self.url, params)
+        while True:
+            pages += 1
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [(product['product_name'], product['id']) for product in response.data['results']]
+            if response.data['next'] is None:
+                return names, pages
+            response = self.client.get(response.data['next'])
+
+    def test_pages_by_id(self):
+        names, pages = self.collect({'page_size': 2})
+        self.assertEqual(pages, 3)
+        self.assertEqual([product_id for _, product_id in names], sorted(Product.objects.values_list('id', flat=True)))
+
+    def test_pages_by_name_are_stable(self):
+        names, _ = self.collect({'page_size': 2, 'ordering': 'product_name'})
+        self.assertEqual(names, sorted(Product.objects.values_list('product_name', 'id')))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for keys in (['abc'], [['abc']], [None]):
+            cursor = KeysetPagination({'id': ('id',)}, default_ordering='id').encode_cursor('id', keys)
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unpaginated_list_unchanged(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 5)
+
+class ProductSearchViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('product_search')
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        for name in ['Diet Cola', 'Coca-Cola', 'Chocolate Bar', 'Cola', 'Water']:
+            Product.objects.create(product_name=name, seller_id=self.seller, amount_available=10, cost=5)
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['product_name'] for product in response.data['results']]
+
+    def test_prefix_matches_rank_first(self):
+        self.assertEqual(self.search('col'), ['Cola', 'Diet Cola', 'Coca-Cola', 'Chocolate Bar'])
+
+    def test_fuzzy_match(self):
+        self.assertEqual(self.search('cocacola')[0], 'Coca-Cola')
+        self.assertEqual(self.search('watter'), ['Water'])
+
+    def test_short_query_is_prefix(self):
+        self.assertEqual(self.search('Co'), ['Coca-Cola', 'Cola'])
+
+    def test_pages(self):
+        # 'Chocolate Bar' shares the 'col' and 'ola' trigrams with 'cola'.
+        response = self.client.get(self.url, {'q': 'cola', 'page_size': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_fuzzy_pages_do_not_reorder(self):
+        for name in ['Butter', 'Watermelon', 'Tonic Water', 'Water Bottle']:
+            Product.objects.create(product_name=name, seller_id=self.seller, amount_available=10, cost=5)
+
+        with mock.patch('api.search.FUZZY_CANDIDATES', 3):
+            expected = self.search('watter', page_size=100)
+            pages = [self.search('watter', page=page, page_size=1) for page in range(1, len(expected) + 2)]
+        self.assertEqual(len(expected), 3)
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_index_follows_renames_and_deletes(self):
+        product = Product.objects.get(product_name='Water')
+        product.product_name = 'Sparkling Water'
+        product.save()
+        self.assertEqual(self.search('sparkling'), ['Sparkling Water'])
+        product.delete()
+        self.assertEqual(self.search('sparkling'), [])
+
+    def test_missing_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class SellerInventoryViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('seller_products')
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        CustomUser.objects.create(user=self.seller, role='seller')
+        other = User.objects.create_user(username='other', password='otherpass123')
+        for name, amount in [('Sold Out', 0), ('Last One', 1), ('Few', 4), ('Plenty', 30)]:
+            Product.objects.create(product_name=name, seller_id=self.seller, amount_available=amount, cost=5)
+        Product.objects.create(product_name='Not Mine', seller_id=other, amount_available=3, cost=5)
+
+        refresh = RoleRefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def names(self, params=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['product_name'] for product in response.data['results']]
+
+    def test_own_products_by_stock(self):
+        self.assertEqual(self.names(), ['Sold Out', 'Last One', 'Few', 'Plenty'])
+
+    def test_stock_filters(self):
+        self.assertEqual(self.names({'stock': 'in'}), ['Last One', 'Few', 'Plenty'])
+        self.assertEqual(self.names({'stock': 'low'}), ['Last One', 'Few'])
+        self.assertEqual(self.names({'stock': 'low', 'low_stock': 1}), ['Last One'])
+        self.assertEqual(self.names({'stock': 'out'}), ['Sold Out'])
+
+    def test_invalid_stock_filter(self):
+        response = self.client.get(self.url, {'stock': 'some'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_buyer_forbidden(self):
+        buyer = User.objects.create_user(username='buyer', password='buyerpass123')
+        CustomUser.objects.create(user=buyer, role='buyer')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(buyer).access_token}')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_in_stock_catalog(self):
+        response = self.client.get(reverse('product_in_stock'), {'page_size': 2})
+        self.assertEqual([product['product_name'] for product in response.data['results']], ['Last One', 'Few'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([product['product_name'] for product in response.data['results']], ['Plenty', 'Not Mine'])
+
+    def test_seller_stock_uses_composite_index(self):
+        plan = Product.objects.for_seller(self.seller.id).low_stock(5).order_by('amount_available', 'id').explain()
+        self.assertIn('product_seller_stock_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_in_stock_uses_partial_index(self):
+        plan = Product.objects.in_stock().filter(id__gt=1).order_by('id').explain()
+        self.assertIn('product_in_stock_idx', plan)
+
+class ExportViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        seller = User.objects.create_user(username='seller', password='sellerpass123')
+        CustomUser.objects.create(user=seller, role='seller', deposit=5)
+        User.objects.create_user(username='no_profile', password='pass123')
+        for i in range(5):
+            Product.objects.create(product_name=f'Product, "{i}"', seller_id=seller, amount_available=i, cost=Decimal('0.05') * i)
+
+    def content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_products_ndjson(self):
+        response = self.client.get(reverse('product_export'))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(rows, product_rows.serialize(Product.objects.order_by('id')))
+
+    def test_users_ndjson(self):
+        staff = User.objects.create_user(username='staff', password='staffpass123', is_staff=True)
+        self.client.force_authenticate(staff)
+        rows = [json.loads(line) for line in self.content(self.client.get(reverse('user_export'))).splitlines()]
+        self.assertEqual(rows, user_export_rows.serialize(User.objects.order_by('id')))
+        self.assertEqual(list(rows[0]), ['id', 'username', 'role', 'deposit'])
+
+    def test_users_staff_only(self):
+        response = self.client.get(reverse('user_export'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        seller = User.objects.get(username='seller')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(seller).access_token}')
+        response = self.client.get(reverse('user_export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_products_csv(self):
+        response = self.client.get(reverse('product_export'), {'output': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(StringIO(self.content(response))))
+        self.assertEqual(rows[0], ['id', 'product_name', 'amount_available', 'cost', 'seller_id'])
+        self.assertEqual(rows[2][1:4], ['Product, "1"', '1', '0.05'])
+        self.assertEqual(len(rows), 6)
+
+    def test_unknown_output(self):
+        response = self.client.get(reverse('product_export'), {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class EventHubTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        self.product = Product.objects.create(product_name='Product 1', seller_id=self.seller, amount_available=10, cost=5)
+        self.buyer = User.objects.create_user(username='buyer', password='buyerpass123')
+        CustomUser.objects.create(user=self.buyer, deposit=20)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def subscribe(self, topics, target=hub):
+        async def subscribe():
+            return target.subscribe(topics)
+
+        subscription = self.loop.run_until_complete(subscribe())
+        self.addCleanup(target.unsubscribe, subscription)
+        return subscription
+
+    def drain(self, subscription):
+        events = []
+        while (event := self.loop.run_until_complete(subscription.get(timeout=0))) is not None:
+            events.append(event)
+        return events
+
+    def test_purchase_pushes_stock_and_own_deposit(self):
+        subscription = self.subscribe([STOCK_TOPIC, deposit_topic(self.buyer.id)])
+        other = self.subscribe([deposit_topic(self.seller.id)])
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase_product(self.buyer.id, self.product.id, 1)
+
+        self.assertEqual(self.drain(subscription), [
+            ('deposit', {'deposit': '15.00'}),
+            ('stock', {'product_id': self.product.id, 'amount_available': 9}),
+        ])
+        self.assertEqual(self.drain(other), [])
+
+    def test_pending_events_coalesce_per_key(self):
+        subscription = self.subscribe([STOCK_TOPIC])
+        for amount in (3, 2, 1):
+            self.product.amount_available = amount
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.save()
+        self.assertEqual(self.drain(subscription), [('stock', {'product_id': self.product.id, 'amount_available': 1})])
+
+    def test_slow_subscriber_overflows_without_blocking(self):
+        small_hub = EventHub(queue_size=2)
+        subscription = self.subscribe(['topic'], target=small_hub)
+        for key in range(3):
+            small_hub.publish('topic', key, ('stock', {}))
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(self.drain(subscription), [])
+
+    def test_sse_format(self):
+        async def first_event():
+            stream = sse_events(['topic'])
+            self.assertEqual(await anext(stream), ': connected\n\n')
+            pending = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            hub.publish('topic', 1, ('stock', {'product_id': 1, 'amount_available': 4}))
+            event = await pending
+            await stream.aclose()
+            return event
+
+        event = self.loop.run_until_complete(first_event())
+        self.assertEqual(event, 'event: stock\ndata: {"product_id": 1, "amount_available": 4}\n\n')
+        self.assertFalse(hub.has_subscribers('topic'))
+
+    def open_stream(self, path):
+        request = RequestFactory().get(path)
+        authenticate_request(request)
+        with mock.patch('api.streams.sse_events') as events:
+            response = self.loop.run_until_complete(event_stream(request))
+        return response, events.call_args and events.call_args.args[0]
+
+    def test_stream_token_in_query_subscribes_deposit(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(self.buyer).access_token}')
+        response = client.post(reverse('events_token'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['expires_in'], 60)
+
+        response, topics = self.open_stream(f'/api/events/?token={response.data["token"]}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(topics, [STOCK_TOPIC, deposit_topic(self.buyer.id)])
+
+        response, topics = self.open_stream('/api/events/')
+        self.assertEqual(topics, [STOCK_TOPIC])
+
+    def test_stream_token_only_opens_the_stream(self):
+        access_token = RoleRefreshToken.for_user(self.buyer).access_token
+        response, _ = self.open_stream(f'/api/events/?token={access_token}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {StreamToken.for_user(self.buyer)}')
+        self.assertEqual(client.get(reverse('active_sessions')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        expired = StreamToken.for_user(self.buyer)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        response, _ = self.open_stream(f'/api/events/?token={expired}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('product_get')
+        self.seller = User.objects.create_user(username='seller', password='sellerpass123')
+        self.product = Product.objects.create(product_name='Product 1', seller_id=self.seller, amount_available=10, cost=5)
+        self.buyer = User.objects.create_user(username='buyer', password='buyerpass123')
+        CustomUser.objects.create(user=self.buyer, deposit=20)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_conditional_get_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()[0]['product_name'], 'Product 1')
+
+        access_token = RoleRefreshToken.for_user(self.buyer).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_purchase_changes_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase_product(self.buyer.id, self.product.id, 1)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['amount_available'], 9)
+
+    def test_product_save_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.product_name = 'Renamed'
+            self.product.save()
+        self.assertNotEqual(self.client.get(self.url)['ETag'], etag)
+
+    def test_concurrent_misses_render_once(self):
+        def slow_render():
+            time.sleep(0.05)
+            return b'[]'
+
+        with mock.patch.object(catalog_cache, 'render', side_effect=slow_render) as render:
+            threads = [threading.Thread(target=catalog_cache.get, args=('concurrent',)) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(render.call_count, 1)
+
+class RowSerializerTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(username='seller', password='pass123')
+        CustomUser.objects.create(user=self.seller, role='seller', deposit=Decimal('1.50'))
+        User.objects.create_user(username='no_profile', password='pass123')
+        Product.objects.create(product_name='Whole', seller_id=self.seller, amount_available=3, cost=Decimal('2'))
+        Product.objects.create(product_name='Cents', seller_id=self.seller, amount_available=0, cost=Decimal('0.05'))
+
+    def assertRendersLike(self, rows, serializer):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(rows), renderer.render(serializer.data))
+
+    def test_products_match_model_serializer(self):
+        products = Product.objects.all()
+        self.assertRendersLike(product_rows.serialize(products), ProductSerializer(products, many=True))
+
+    def test_users_match_model_serializer(self):
+        users = User.objects.all()
+        self.assertRendersLike(user_rows.serialize(users), UserSerializer(users, many=True))
+
+    def test_user_without_profile_renders_null(self):
+        row = user_rows.serialize(User.objects.filter(username='no_profile'))[0]
+        self.assertEqual((row['role'], row['deposit']), (None, None))
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            user_rows.serialize(User.objects.all())
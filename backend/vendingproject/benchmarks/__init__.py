@@ -0,0 +1,54 @@
+"""
+Stand-alone benchmarks for the API.
+
+Run them from ``backend/vendingproject`` with ``python -m benchmarks.<name>``.
+Each benchmark works on a throw-away SQLite database and shared cache files
+so it never touches ``db.sqlite3`` or the caches of a server on the host.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup(db_path=None):
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vendingproject.settings')
+
+    import django
+    from django.conf import settings
+
+    from api.sharedcache import relocate
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='vending-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    cache_dir = tempfile.mkdtemp(prefix='vending-bench-', dir=settings.SHARED_CACHE_DIR)
+    atexit.register(shutil.rmtree, cache_dir, True)
+    settings.CACHES = relocate(settings.CACHES, cache_dir)
+    django.setup()
+
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
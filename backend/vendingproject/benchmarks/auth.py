@@ -0,0 +1,77 @@
+"""
+Signature verifications and wall time per authenticated request, and the
+cost of authenticating one request with the verified token cache hit and
+missed.
+
+    python -m benchmarks.auth [--requests N]
+"""
+import argparse
+import time
+from unittest import mock
+
+from benchmarks import percentile, setup, timed
+
+
+def authentication_cost(access_token, requests):
+    from django.test import RequestFactory
+    from api.authentication import authenticate_request
+    from api.tokencache import VerifiedTokenCache
+
+    factory = RequestFactory(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+    for label, max_entries in (('cache miss', 0), ('cache hit', 10000)):
+        with mock.patch('api.authentication.verified_tokens', VerifiedTokenCache(max_entries=max_entries)):
+            authenticate_request(factory.get('/'))
+            samples = []
+            for _ in range(requests):
+                request = factory.get('/')
+                start = time.perf_counter()
+                assert authenticate_request(request) is not None
+                samples.append(time.perf_counter() - start)
+        print(f'authenticate_request {label:<10} p50 {percentile(samples, 50) * 1e6:6.1f} us   '
+              f'p99 {percentile(samples, 99) * 1e6:6.1f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.backends import TokenBackend
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from base.models import CustomUser, Product, User
+
+    seller = User.objects.create_user(username='bench_seller', password='x')
+    CustomUser.objects.create(user=seller, role='seller')
+    buyer = User.objects.create_user(username='bench_buyer', password='x')
+    CustomUser.objects.create(user=buyer, role='buyer', deposit=10 ** 6)
+    product = Product.objects.create(product_name='Bench', seller_id=seller, amount_available=10 ** 6, cost=5)
+
+    seller_client = APIClient()
+    seller_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(seller).access_token}')
+    buyer_client = APIClient()
+    buyer_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(buyer).access_token}')
+
+    scenarios = {
+        'PUT product/<id>/': lambda: seller_client.put(f'/api/product/{product.id}/', {'cost': 5}),
+        'POST buy/': lambda: buyer_client.post('/api/buy/', {'product_id': product.id, 'quantity': 1}),
+        'POST deposit/': lambda: buyer_client.post('/api/deposit/', {'amount': '0.05'}),
+    }
+
+    decode = TokenBackend.decode
+    for name, request in scenarios.items():
+        with mock.patch.object(TokenBackend, 'decode', autospec=True, side_effect=decode) as spy:
+            request()
+            verifications = spy.call_count
+
+        elapsed = timed(request, args.requests)
+        print(f'{name:<20} verifications/request={verifications}  '
+              f'{elapsed / args.requests * 1000:.3f} ms/request')
+
+    authentication_cost(RefreshToken.for_user(buyer).access_token, args.requests * 10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Cache operation latency for the local-memory, file-based and shared-memory
+backends, and a counter incremented from several processes at once.
+
+    python -m benchmarks.cache_backends [--ops 5000] [--processes 4]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks import setup
+
+
+def backends(directory):
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.core.cache.backends.locmem import LocMemCache
+    from api.sharedcache import SharedMemoryCache
+
+    options = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+    return {
+        'locmem': lambda: LocMemCache('bench', options),
+        'filebased': lambda: FileBasedCache(os.path.join(directory, 'files'), options),
+        'sharedmemory': lambda: SharedMemoryCache(os.path.join(directory, 'shared.cache'), options),
+    }
+
+
+def per_op(fn, ops):
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return (time.perf_counter() - start) / ops * 1e6
+
+
+def count(make_cache, times):
+    cache = make_cache()
+    for _ in range(times):
+        cache.incr('counter')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int, default=5000)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    setup()
+    directory = tempfile.mkdtemp(prefix='vending-cache-bench-')
+    keys = [f'key_{i % 1000}' for i in range(args.ops)]
+    value = {'deposit': 125, 'coins': [5, 10, 20, 50, 100]}
+
+    print(f'{args.ops} operations on 1000 keys (us per op):')
+    print(f'  {"backend":<13} {"set":>8} {"get":>8} {"add":>8} {"incr":>8}')
+    for name, make_cache in backends(directory).items():
+        cache = make_cache()
+        set_us = per_op(lambda i: cache.set(keys[i], value), args.ops)
+        get_us = per_op(lambda i: cache.get(keys[i]), args.ops)
+        add_us = per_op(lambda i: cache.add(f'add_{i}', i), args.ops)
+        cache.set('counter', 0)
+        incr_us = per_op(lambda i: cache.incr('counter'), args.ops)
+        print(f'  {name:<13} {set_us:8.1f} {get_us:8.1f} {add_us:8.1f} {incr_us:8.1f}')
+
+    times = 1000
+    context = multiprocessing.get_context('fork')
+    print(f'{args.processes} processes each incrementing one counter {times} times:')
+    for name, make_cache in backends(directory).items():
+        cache = make_cache()
+        cache.set('counter', 0)
+        start = time.perf_counter()
+        workers = [context.Process(target=count, args=(make_cache, times)) for _ in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        print(f'  {name:<13} counter {cache.get("counter"):>6} of {args.processes * times}   {elapsed * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Latency of a three-product cart checkout against single purchases.
+
+    python -m benchmarks.cart [--requests N]
+"""
+import argparse
+
+from benchmarks import setup, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.test import APIClient
+    from api.tokens import RoleRefreshToken
+    from base.models import CustomUser, Product, User
+
+    seller = User.objects.create_user(username='bench_seller')
+    buyer = User.objects.create_user(username='bench_buyer')
+    CustomUser.objects.create(user=buyer, role='buyer', deposit=10 ** 6)
+    products = [
+        Product.objects.create(product_name=f'Bench {i}', seller_id=seller, amount_available=10 ** 6, cost=1)
+        for i in range(3)
+    ]
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(buyer).access_token}')
+    items = [{'product_id': product.id, 'quantity': 1} for product in products]
+
+    def single():
+        client.post('/api/buy/', items[0], format='json')
+
+    def three_singles():
+        for item in items:
+            client.post('/api/buy/', item, format='json')
+
+    def cart():
+        client.post('/api/buy/cart/', {'items': items}, format='json')
+
+    for name, request in (('1 x buy/', single), ('3 x buy/', three_singles), ('buy/cart/ (3 items)', cart)):
+        elapsed = timed(request, args.requests)
+        print(f'{name:<22} {elapsed / args.requests * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Page latency across a large catalog: keyset cursors against OFFSET paging.
+
+    python -m benchmarks.catalog_pagination [--rows 1000000] [--page-size 50]
+"""
+import argparse
+
+from benchmarks import setup, timed
+
+
+def populate(rows):
+    from base.models import Product, User
+
+    seller = User.objects.create_user(username='bench_seller')
+    batch = 20000
+    for start in range(0, rows, batch):
+        Product.objects.bulk_create(
+            Product(product_name=f'Product {i % 7919:04d}', seller_id=seller, amount_available=i % 50, cost=1)
+            for i in range(start, min(start + batch, rows))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    populate(args.rows)
+
+    from rest_framework.test import APIClient
+    from api.views import product_pagination
+    from base.models import Product
+
+    client = APIClient()
+    pagination = product_pagination()
+    url = '/api/product/get/'
+
+    for ordering, fields in (('id', ('id',)), ('product_name', ('product_name', 'id'))):
+        print(f'ordering={ordering}')
+        ordered = Product.objects.order_by(*fields)
+        for label, position in (('first', 0), ('middle', args.rows // 2), ('last', args.rows - args.page_size)):
+            if position:
+                keys = list(ordered.values_list(*fields)[position - 1])
+                cursor = pagination.encode_cursor(ordering, keys)
+                keyset = {'cursor': cursor, 'page_size': args.page_size}
+            else:
+                keyset = {'ordering': ordering, 'page_size': args.page_size}
+
+            keyset_ms = timed(lambda: client.get(url, keyset), args.repeat) / args.repeat * 1000
+            offset_ms = timed(lambda: list(ordered[position:position + args.page_size]), args.repeat) / args.repeat * 1000
+            print(f'  {label:<7} keyset request {keyset_ms:7.2f} ms   OFFSET query alone {offset_ms:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Coin breakdown lookups: precomputed table against greedy and recursive
+solvers.
+
+    python -m benchmarks.change [--lookups N]
+"""
+import argparse
+import random
+import time
+
+
+def greedy(cents, coins):
+    result = {}
+    for coin in coins:
+        count, cents = divmod(cents, coin)
+        if count:
+            result[coin] = count
+    return result if cents == 0 else None
+
+
+def recursive(cents, coins):
+    # Plain top-down search without memoisation, as written naively.
+    if cents == 0:
+        return {}
+    best = None
+    for coin in coins:
+        if coin <= cents:
+            rest = recursive(cents - coin, coins)
+            if rest is not None and (best is None or sum(rest.values()) + 1 < sum(best.values())):
+                best = dict(rest)
+                best[coin] = best.get(coin, 0) + 1
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    from api.change import COINS, ChangeTable
+
+    start = time.perf_counter()
+    table = ChangeTable()
+    print(f'table build ({table.limit // table.unit + 1} entries): {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    amounts = [random.randrange(0, 2000, 5) for _ in range(args.lookups)]
+    for name, solve in (('table', lambda cents: table.breakdown(cents)), ('greedy', lambda cents: greedy(cents, COINS))):
+        start = time.perf_counter()
+        for cents in amounts:
+            solve(cents)
+        print(f'{name:<10} {(time.perf_counter() - start) / args.lookups * 1e6:.2f} us/lookup (0-20 EUR)')
+
+    small = [random.randrange(0, 65, 5) for _ in range(20)]
+    start = time.perf_counter()
+    for cents in small:
+        recursive(cents, COINS)
+    print(f'{"recursive":<10} {(time.perf_counter() - start) / len(small) * 1e6:.2f} us/lookup (0-0.60 EUR only)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+End-to-end latency of inserting ten coins one request at a time against a
+single batched deposit request.
+
+    python -m benchmarks.deposit [--rounds N]
+"""
+import argparse
+
+from benchmarks import setup, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=100)
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.test import APIClient
+    from api.tokens import RoleRefreshToken
+    from base.models import CustomUser, User
+
+    buyer = User.objects.create_user(username='bench_buyer')
+    CustomUser.objects.create(user=buyer, role='buyer')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(buyer).access_token}')
+    coins = ['0.05', '0.10', '0.20', '0.50', '1.00'] * 2
+
+    def one_by_one():
+        for coin in coins:
+            client.post('/api/deposit/', {'amount': coin}, format='json')
+
+    def batched():
+        client.post('/api/deposit/', {'coins': coins}, format='json')
+
+    for name, insert in (('10 x deposit/', one_by_one), ('1 x deposit/ (10 coins)', batched)):
+        elapsed = timed(insert, args.rounds)
+        print(f'{name:<24} {elapsed / args.rounds * 1000:.3f} ms per 10 coins')
+
+
+if __name__ == '__main__':
+    main()
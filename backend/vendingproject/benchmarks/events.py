@@ -0,0 +1,139 @@
+"""
+Load test of the Server-Sent Events stream: thousands of idle subscribers
+connected through the real ASGI application, fan-out latency of stock
+updates published from a sync thread, and a share of stalled clients that
+must be dropped without slowing the publisher.
+
+    python -m benchmarks.events [--subscribers 5000] [--stalled 0.1]
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+from benchmarks import percentile, setup
+
+
+def rss_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+class Deliveries:
+    def __init__(self):
+        self.count = 0
+        self.target = None
+        self.done = asyncio.Event()
+
+    def expect(self, target):
+        self.count = 0
+        self.target = target
+        self.done.clear()
+
+    def add(self):
+        self.count += 1
+        if self.count == self.target:
+            self.done.set()
+
+
+class Client:
+    """One open stream; stalled clients stop reading after connecting."""
+
+    def __init__(self, stalled, deliveries):
+        self.stalled = stalled
+        self.deliveries = deliveries
+        self.connected = asyncio.Event()
+        self.overflowed = False
+        self.stall = asyncio.Event()
+        self.disconnect = asyncio.Event()
+
+    async def receive(self):
+        if not hasattr(self, 'requested'):
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        body = message.get('body', b'')
+        if body.startswith(b': connected'):
+            self.connected.set()
+        elif body.startswith(b'event: stock'):
+            if self.stalled:
+                await self.stall.wait()
+            else:
+                self.deliveries.add()
+        elif body.startswith(b'event: overflow'):
+            self.overflowed = True
+
+
+async def run(args):
+    from vendingproject.asgi import application
+    from base.events import hub, publish_stock_levels
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': '/api/events/', 'query_string': b'', 'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+    }
+    stalled_every = round(1 / args.stalled) if args.stalled else 0
+    deliveries = Deliveries()
+    clients = [Client(bool(stalled_every) and i % stalled_every == 0, deliveries) for i in range(args.subscribers)]
+
+    before = rss_mb()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(application(dict(scope), client.receive, client.send)) for client in clients]
+    await asyncio.gather(*(client.connected.wait() for client in clients))
+    connect_s = time.perf_counter() - start
+    idle_kb = (rss_mb() - before) * 1024 / args.subscribers
+    print(f'{args.subscribers} subscribers connected in {connect_s:.2f} s, {idle_kb:.1f} KB RSS each while idle')
+
+    loop = asyncio.get_running_loop()
+    readers = [client for client in clients if not client.stalled]
+    fanout, publish = [], []
+    for update in range(args.updates):
+        deliveries.expect(len(readers))
+        started = time.perf_counter()
+        # Publish from a worker thread, as a sync purchase view would.
+        elapsed = await loop.run_in_executor(None, timed_publish, publish_stock_levels, {update % 500: update})
+        await deliveries.done.wait()
+        fanout.append(time.perf_counter() - started)
+        publish.append(elapsed)
+
+    print(f'{args.updates} updates to {len(readers)} readers ({args.subscribers - len(readers)} stalled):')
+    for label, samples in (('first', slice(0, 50)), ('last', slice(-50, None))):
+        print(f'  {label} 50: publish() p50 {percentile(publish[samples], 50) * 1000:6.2f} ms   '
+              f'all delivered p50 {percentile(fanout[samples], 50) * 1000:7.2f} ms   '
+              f'p95 {percentile(fanout[samples], 95) * 1000:7.2f} ms')
+    print(f'  still subscribed: {len(hub._topics.get("stock", ()))}')
+
+    for client in clients:
+        client.stall.set()
+    await asyncio.sleep(0.5)
+    print(f'  stalled clients told to reload on resume: {sum(client.overflowed for client in clients)}')
+    for client in clients:
+        client.disconnect.set()
+    await asyncio.wait(tasks, timeout=10)
+
+
+def timed_publish(publish, levels):
+    start = time.perf_counter()
+    publish(levels)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscribers', type=int, default=5000)
+    parser.add_argument('--stalled', type=float, default=0.1, help='share of clients that stop reading')
+    parser.add_argument('--updates', type=int, default=600)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    settings.ALLOWED_HOSTS = ['localhost']
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
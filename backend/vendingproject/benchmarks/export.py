@@ -0,0 +1,70 @@
+"""
+Peak RSS of dumping the whole product table: the in-memory list render
+against the streaming NDJSON and CSV exports.
+
+    python -m benchmarks.export [--rows 1000000]
+
+Every mode runs in a fresh interpreter so each gets its own ru_maxrss.
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks import setup
+
+MODES = ('idle', 'list', 'ndjson', 'csv')
+
+
+def populate(rows):
+    from base.models import Product, User
+
+    seller = User.objects.create_user(username='bench_seller')
+    batch = 20000
+    for start in range(0, rows, batch):
+        Product.objects.bulk_create(
+            Product(product_name=f'Product {i}', seller_id=seller, amount_available=i % 50, cost='1.05')
+            for i in range(start, min(start + batch, rows))
+        )
+
+
+def measure(mode, db_path):
+    setup(db_path)
+
+    from django.test import Client
+
+    client = Client()
+    start = time.perf_counter()
+    size = 0
+    if mode == 'list':
+        from api.catalog import catalog_cache
+        size = len(catalog_cache.render())
+    elif mode != 'idle':
+        response = client.get('/api/product/export/', {'output': mode})
+        for chunk in response.streaming_content:
+            size += len(chunk)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'  {mode:<7} peak RSS {peak_mb:8.1f} MB   {size / 2 ** 20:7.1f} MB out in {elapsed:6.2f} s')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--measure', choices=MODES)
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    if args.measure:
+        return measure(args.measure, args.db)
+
+    db_path = setup()
+    populate(args.rows)
+    print(f'{args.rows} products')
+    for mode in MODES:
+        subprocess.run([sys.executable, '-m', 'benchmarks.export', '--measure', mode, '--db', db_path], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Purchase throughput on a single hot product as the number of concurrent
+buyers grows, with and without the write-behind stock counters.
+
+    python -m benchmarks.hot_inventory [--buyers 1,2,4,8,16] [--stock N]
+"""
+import argparse
+import os
+import tempfile
+from unittest import mock
+
+from benchmarks import setup
+from benchmarks.purchase import engine_purchase, run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buyers', default='1,2,4,8,16')
+    parser.add_argument('--stock', type=int, default=400)
+    args = parser.parse_args()
+
+    setup()
+
+    from api.inventory import HotInventory
+
+    journal_dir = tempfile.mkdtemp(prefix='vending-journal-')
+    for buyers in (int(n) for n in args.buyers.split(',')):
+        _, elapsed = run(engine_purchase, buyers, args.stock)
+        database_rate = args.stock / elapsed
+
+        inventory = HotInventory([], os.path.join(journal_dir, f'{buyers}.journal'), batch_size=100)
+
+        def make_hot(product):
+            inventory.product_ids = frozenset([product.id])
+
+        with mock.patch('api.purchases.hot_inventory', inventory):
+            sold, elapsed = run(engine_purchase, buyers, args.stock, prepare=make_hot)
+            inventory.flush()
+        hot_rate = sold / elapsed
+
+        print(f'buyers={buyers:<3} database counters={database_rate:7.0f}/s  '
+              f'hot counters={hot_rate:7.0f}/s  sold={sold}/{args.stock}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Balance write throughput under contention: credit_deposit() on one hot
+CustomUser row with BALANCE_LEDGER disabled, the default, and enabled, where
+each write also appends a ledger entry. The ledger is an audit log, so the
+enabled run is expected to be slower. Also the cost of reading a balance back
+from snapshot plus tail.
+
+    python -m benchmarks.ledger [--writers N] [--writes N]
+"""
+import argparse
+import threading
+import time
+from decimal import Decimal
+
+from benchmarks import setup, timed
+
+
+def contended(write, writers, writes):
+    from django.db import connection
+
+    barrier = threading.Barrier(writers)
+
+    def writer():
+        barrier.wait()
+        try:
+            for _ in range(writes):
+                write()
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return writers * writes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.test import override_settings
+    from api.purchases import credit_deposit
+    from base import ledger
+    from base.models import CustomUser, User
+
+    user = User.objects.create_user(username='bench_buyer')
+    CustomUser.objects.create(user=user)
+    amount = Decimal('0.05')
+
+    def write():
+        credit_deposit(user.id, amount)
+
+    with override_settings(BALANCE_LEDGER={'ENABLED': False}):
+        before = contended(write, args.writers, args.writes)
+    with override_settings(BALANCE_LEDGER={'ENABLED': True}):
+        after = contended(write, args.writers, args.writes)
+    print(f'ledger disabled  {before:8.0f} writes/s')
+    print(f'ledger enabled   {after:8.0f} writes/s ({(1 - after / before) * 100:.0f}% slower)')
+
+    reads = 1000
+    print(f'balance() with {args.writers * args.writes}-entry tail: '
+          f'{timed(lambda: ledger.balance(user.id), reads) / reads * 1000:.3f} ms')
+    ledger.compact()
+    print(f'balance() after compact(): {timed(lambda: ledger.balance(user.id), reads) / reads * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Purchase latency during a sign-in storm, with password hashing inline on
+the request threads and through the bounded hashing pool.
+
+    python -m benchmarks.login_storm [--storm 16] [--seconds 10]
+
+Storm clients that get a 503 wait for Retry-After, as the kiosks do.
+"""
+import argparse
+import logging
+import threading
+import time
+from unittest import mock
+
+from benchmarks import percentile, setup
+
+
+def populate(storm):
+    from django.contrib.auth.hashers import make_password
+    from base.models import CustomUser, Product, User
+
+    password = make_password('storm-pass')
+    for i in range(storm):
+        user = User.objects.create(username=f'storm{i}', password=password)
+        CustomUser.objects.create(user=user)
+
+    buyer = User.objects.create_user(username='bench_buyer')
+    CustomUser.objects.create(user=buyer, deposit=10 ** 7)
+    product = Product.objects.create(product_name='Bench', seller_id=buyer, amount_available=10 ** 8, cost='0.05')
+    return buyer, product
+
+
+def storm_client(index, stop, counts):
+    from django.db import OperationalError, connection
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    while not stop.is_set():
+        try:
+            response = client.post('/api/signin/', {'username': f'storm{index}', 'password': 'storm-pass'})
+        except OperationalError:
+            # SQLite gave up waiting for the write lock.
+            counts['locked'] = counts.get('locked', 0) + 1
+            continue
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            stop.wait(int(response['Retry-After']))
+    connection.close()
+
+
+def measure(args, buyer, product):
+    from rest_framework.test import APIClient
+    from api.tokens import RoleRefreshToken
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(buyer).access_token}')
+    stop = threading.Event()
+    counts = {}
+    threads = [threading.Thread(target=storm_client, args=(i, stop, counts)) for i in range(args.storm)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+
+    samples = []
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        response = client.post('/api/buy/', {'product_id': product.id, 'quantity': 1})
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.content
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return samples, counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--storm', type=int, default=16, help='concurrent sign-in clients')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    setup()
+    # Every shed sign-in would otherwise log a 'Service Unavailable' warning.
+    logging.disable(logging.ERROR)
+    buyer, product = populate(args.storm)
+
+    from api.hashing import hashing_pool
+
+    print(f'{args.storm} clients signing in while one buys for {args.seconds:.0f} s '
+          f'(pool: {hashing_pool.workers} workers, {hashing_pool.max_pending} pending)')
+    inline = mock.patch.object(hashing_pool, 'run', lambda fn, *fn_args: fn(*fn_args))
+    for label, patch in (('inline hashing', inline), ('hashing pool', None)):
+        if patch is not None:
+            patch.start()
+        samples, counts = measure(args, buyer, product)
+        if patch is not None:
+            patch.stop()
+        print(f'  {label:<15} purchases p50 {percentile(samples, 50) * 1000:7.1f} ms   '
+              f'p99 {percentile(samples, 99) * 1000:7.1f} ms   ({len(samples)} buys)   '
+              f'sign-ins {counts.get(200, 0)} ok, {counts.get(503, 0)} shed, {counts.get("locked", 0)} timed out on the database')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Logging out every session of one account: blacklisting its outstanding
+refresh tokens one get_or_create at a time, as logout-all used to, against
+the single bulk insert of blacklist_user_tokens().
+
+    python -m benchmarks.logout_all [--sessions 1000]
+"""
+import argparse
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks import setup
+
+
+def outstanding(user, sessions):
+    from django.utils import timezone
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+    expires_at = timezone.now() + timedelta(days=1)
+    return OutstandingToken.objects.bulk_create([
+        OutstandingToken(user=user, jti=uuid.uuid4().hex, token='', expires_at=expires_at)
+        for _ in range(sessions)
+    ])
+
+
+def measure(fn):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+    return elapsed, len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+    from api.tokens import blacklist_user_tokens
+    from base.models import User
+
+    legacy_user = User.objects.create_user(username='bench_legacy')
+    tokens = outstanding(legacy_user, args.sessions)
+
+    def legacy():
+        for token in tokens:
+            BlacklistedToken.objects.get_or_create(token=token)
+
+    bulk_user = User.objects.create_user(username='bench_bulk')
+    outstanding(bulk_user, args.sessions)
+
+    print(f'Blacklisting {args.sessions} sessions of one user:')
+    for label, fn in (('one by one', legacy), ('bulk insert', lambda: blacklist_user_tokens(bulk_user.id))):
+        elapsed, queries = measure(fn)
+        print(f'  {label:<12} {elapsed * 1000:8.1f} ms   {queries:6d} queries')
+
+
+if __name__ == '__main__':
+    main()
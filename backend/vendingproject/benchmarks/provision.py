@@ -0,0 +1,82 @@
+"""
+Bulk user provisioning throughput: the provision_users command against one
+registration request per user.
+
+    python -m benchmarks.provision [--users 100000] [--sample 200]
+
+Django's PBKDF2 hasher costs a fixed amount of CPU per password, which only
+more worker processes can divide. The insert pipeline is therefore timed
+at full size with a cheap hasher, and real hashing on a sample.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks import setup
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def write_users(path, count, prefix):
+    with open(path, 'w') as file:
+        for i in range(count):
+            file.write(json.dumps({'username': f'{prefix}{i}', 'password': f'secret-{i}', 'deposit': i % 3}) + '\n')
+
+
+def provision(path, workers):
+    from io import StringIO
+    from django.core.management import call_command
+
+    start = time.perf_counter()
+    call_command('provision_users', path, '--workers', str(workers), verbosity=0, stdout=StringIO())
+    return time.perf_counter() - start
+
+
+def per_request(count, prefix):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    start = time.perf_counter()
+    for i in range(count):
+        client.post('/api/user/', {'username': f'{prefix}{i}', 'password': f'secret-{i}', 'role': 'buyer'})
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hashers
+
+    directory = tempfile.mkdtemp(prefix='vending-provision-')
+    default_hashers = settings.PASSWORD_HASHERS
+
+    print(f'{args.workers} hashing worker(s)')
+    for label, hashers, count in (('MD5 (pipeline only)', FAST_HASHERS, args.users), ('PBKDF2 (default)', default_hashers, args.sample)):
+        settings.PASSWORD_HASHERS = hashers
+        get_hashers.cache_clear()
+        tag = 'fast' if hashers is FAST_HASHERS else 'pbkdf2'
+
+        path = os.path.join(directory, f'{tag}.ndjson')
+        write_users(path, count, f'bulk_{tag}_')
+        bulk = provision(path, args.workers)
+        request_count = min(count, args.sample)
+        requests = per_request(request_count, f'request_{tag}_')
+
+        print(f'{label}:')
+        print(f'  provision_users  {count:7d} users in {bulk:8.1f} s   {count / bulk:8.0f} users/s')
+        print(f'  POST user/       {request_count:7d} users in {requests:8.1f} s   {request_count / requests:8.0f} users/s')
+        if count < args.users:
+            print(f'  projected {args.users} users: {args.users / (count / bulk) / 60:.0f} min with provision_users, '
+                  f'{args.users / (request_count / requests) / 60:.0f} min through the API')
+
+
+if __name__ == '__main__':
+    main()
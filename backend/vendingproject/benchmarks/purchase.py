@@ -0,0 +1,94 @@
+"""
+Concurrent purchase stress test: oversells and purchases per second of the
+old read-modify-write path against the guarded-UPDATE purchase engine.
+
+    python -m benchmarks.purchase [--buyers N] [--stock N]
+"""
+import argparse
+import threading
+import time
+
+from benchmarks import setup
+
+
+def legacy_purchase(user_id, product_id, quantity):
+    # The pre-engine ProductPurchaseView logic, minus the HTTP layer.
+    from base.models import CustomUser, Product
+
+    product = Product.objects.get(id=product_id)
+    total_price = product.cost * quantity
+    if product.amount_available < quantity:
+        return False
+    custom_user = CustomUser.objects.get(user_id=user_id)
+    if custom_user.deposit < total_price:
+        return False
+    custom_user.deposit -= total_price
+    custom_user.save()
+    product.amount_available -= quantity
+    product.save()
+    return True
+
+
+def engine_purchase(user_id, product_id, quantity):
+    from api.purchases import PurchaseError, purchase_product
+
+    try:
+        purchase_product(user_id, product_id, quantity)
+    except PurchaseError:
+        return False
+    return True
+
+
+def run(purchase, buyers, stock, prepare=None):
+    from django.db import connection
+    from base.models import CustomUser, Product, User
+
+    User.objects.filter(username__startswith='bench_').delete()
+    seller = User.objects.create_user(username='bench_seller')
+    product = Product.objects.create(product_name='Hot', seller_id=seller, amount_available=stock, cost=1)
+    if prepare is not None:
+        prepare(product)
+    user_ids = []
+    for i in range(buyers):
+        user = User.objects.create_user(username=f'bench_buyer_{i}')
+        CustomUser.objects.create(user=user, deposit=stock)
+        user_ids.append(user.id)
+
+    sold = [0] * buyers
+    barrier = threading.Barrier(buyers)
+
+    def buyer(index):
+        barrier.wait()
+        try:
+            while purchase(user_ids[index], product.id, 1):
+                sold[index] += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(buyers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return sum(sold), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buyers', type=int, default=8)
+    parser.add_argument('--stock', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+
+    for name, purchase in (('read-modify-write', legacy_purchase), ('guarded update', engine_purchase)):
+        sold, elapsed = run(purchase, args.buyers, args.stock)
+        print(f'{name:<18} sold={sold} stock={args.stock} oversold={max(0, sold - args.stock)} '
+              f'purchases/s={sold / elapsed:.0f}')
+
+
+if __name__ == '__main__':
+    main()
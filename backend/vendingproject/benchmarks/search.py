@@ -0,0 +1,61 @@
+"""
+Product search latency over a large catalog with the FTS5 trigram index.
+
+    python -m benchmarks.search [--rows 1000000]
+"""
+import argparse
+import random
+
+from benchmarks import percentile, setup
+
+BRANDS = ['Acme', 'Bolt', 'Crisp', 'Delta', 'Echo', 'Fizz', 'Glow', 'Halo', 'Iris', 'Jolt', 'Kilo', 'Luna',
+          'Mira', 'Nova', 'Orbit', 'Pico', 'Quartz', 'Rio', 'Sol', 'Terra', 'Ultra', 'Vita', 'Wave', 'Zest']
+ITEMS = ['Cola', 'Chocolate', 'Water', 'Chips', 'Cookie', 'Gum', 'Juice', 'Tea', 'Coffee', 'Pretzel', 'Candy',
+         'Mints', 'Nuts', 'Wafer', 'Soda', 'Lemonade', 'Popcorn', 'Granola', 'Toffee', 'Crackers']
+SIZES = ['Mini', 'Small', 'Large', 'XL', '330ml', '500ml', '1L', 'Pack', 'Duo', 'Max']
+QUERIES = ['Ec', 'ech', 'chocolate', 'choclate', 'nova granola', 'lemnade 500', 'zest toffe xl']
+
+
+def populate(rows):
+    from base.models import Product, User
+
+    seller = User.objects.create_user(username='bench_seller')
+    rng = random.Random(0)
+    batch = 20000
+    for start in range(0, rows, batch):
+        Product.objects.bulk_create(
+            Product(
+                product_name=f'{rng.choice(BRANDS)} {rng.choice(ITEMS)} {rng.choice(SIZES)} {rng.randrange(1000)}',
+                seller_id=seller, amount_available=rng.randrange(50), cost=1,
+            )
+            for _ in range(start, min(start + batch, rows))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    populate(args.rows)
+
+    import time
+    from api.search import search_products
+
+    print(f'{args.rows} products, {args.page_size} per page')
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = search_products(query, args.page_size)
+            samples.append(time.perf_counter() - start)
+        top = results[0]['product_name'] if results else '-'
+        print(f'  {query!r:<16} p50 {percentile(samples, 50) * 1000:8.2f} ms   '
+              f'p95 {percentile(samples, 95) * 1000:8.2f} ms   top: {top}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+List serialization throughput: values_list row serializers against the
+ModelSerializers they replace, including JSON rendering.
+
+    python -m benchmarks.serializers [--rows 10000 100000]
+"""
+import argparse
+
+from benchmarks import setup, timed
+
+
+def populate(rows):
+    from django.contrib.auth.hashers import make_password
+    from base.models import CustomUser, Product, User
+
+    User.objects.all().delete()
+    password = make_password('bench')
+    batch = 20000
+    for start in range(0, rows, batch):
+        users = User.objects.bulk_create(
+            User(username=f'bench_user_{i}', password=password)
+            for i in range(start, min(start + batch, rows))
+        )
+        CustomUser.objects.bulk_create(
+            CustomUser(user=user, role='seller' if i % 2 else 'buyer', deposit=i % 100)
+            for i, user in enumerate(users)
+        )
+
+    seller = User.objects.first()
+    for start in range(0, rows, batch):
+        Product.objects.bulk_create(
+            Product(product_name=f'Product {i}', seller_id=seller, amount_available=i % 50, cost='1.05')
+            for i in range(start, min(start + batch, rows))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.renderers import JSONRenderer
+    from api.serializers import ProductSerializer, UserSerializer, product_rows, user_rows
+    from base.models import Product, User
+
+    renderer = JSONRenderer()
+    cases = (
+        ('product/get/', Product, ProductSerializer, product_rows),
+        ('user/', User, UserSerializer, user_rows),
+    )
+
+    for rows in args.rows:
+        populate(rows)
+        print(f'{rows} rows')
+        for label, model, serializer_class, row_serializer in cases:
+            def model_serializer():
+                return renderer.render(serializer_class(model.objects.all(), many=True).data)
+
+            def values_list():
+                return renderer.render(row_serializer.serialize(model.objects.all()))
+
+            assert model_serializer() == values_list()
+            slow = rows * args.repeat / timed(model_serializer, args.repeat)
+            fast = rows * args.repeat / timed(values_list, args.repeat)
+            print(f'  {label:<13} ModelSerializer {slow:10.0f} rows/s   values_list {fast:10.0f} rows/s   ({fast / slow:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Session bookkeeping for one kiosk account with many open sessions: the
+pickled list of refresh tokens the sign-in view used to keep against the
+session registry.
+
+    python -m benchmarks.sessions [--sessions 10000]
+"""
+import argparse
+import time
+
+from benchmarks import percentile, setup
+
+
+def legacy_add(cache, user_id, token):
+    active_sessions = cache.get(f'active_sessions_{user_id}', [])
+    active_sessions.append(token)
+    cache.set(f'active_sessions_{user_id}', active_sessions, timeout=86400)
+
+
+def legacy_count(cache, user_id):
+    return len(cache.get(f'active_sessions_{user_id}', []))
+
+
+def legacy_remove(cache, user_id, token):
+    active_sessions = cache.get(f'active_sessions_{user_id}', [])
+    if token in active_sessions:
+        active_sessions.remove(token)
+        cache.set(f'active_sessions_{user_id}', active_sessions, timeout=86400)
+
+
+def sample(fn, args):
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    print(f'  {label:<22} p50 {percentile(samples, 50) * 1e6:9.1f} us   p99 {percentile(samples, 99) * 1e6:9.1f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=10000)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.cache import cache
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from api.sessions import session_registry
+
+    user_id = 1
+    tokens = []
+    for _ in range(args.sessions):
+        token = RefreshToken()
+        token['user_id'] = user_id
+        tokens.append(token)
+    encoded = [str(token) for token in tokens]
+    tail = slice(-1000, None)
+    logouts = range(0, args.sessions, max(1, args.sessions // 1000))
+
+    print(f'{args.sessions} sessions for one user:')
+    print(' pickled list')
+    report('sign-in (last 1000)', sample(lambda token: legacy_add(cache, user_id, token), encoded)[tail])
+    report('count', sample(lambda _: legacy_count(cache, user_id), range(1000)))
+    report('logout', sample(lambda i: legacy_remove(cache, user_id, encoded[i]), logouts))
+
+    print(' session registry')
+    report('sign-in (last 1000)', sample(session_registry.add, tokens)[tail])
+    report('count', sample(lambda _: session_registry.count(user_id), range(1000)))
+    report('logout', sample(lambda i: session_registry.remove(tokens[i]), logouts))
+    print(f'  counted after logouts: {session_registry.count(user_id)}')
+
+
+if __name__ == '__main__':
+    main()
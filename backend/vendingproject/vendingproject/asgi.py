@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "vendingproject.settings")
 
 application = get_asgi_application()
+
+# Checks of refresh tokens go to the database until the blacklist filter has
+# loaded, which is done in the background so startup does not wait for it.
+from api.blacklist import blacklist_filter  # noqa: E402
+
+blacklist_filter.start()
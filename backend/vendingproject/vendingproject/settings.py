@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+import hashlib
+import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,7 +51,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.RequestTokenAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -61,7 +64,7 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 
     'AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.RequestTokenAuthentication',
     ),
     'SWAGGER_UI_SETTINGS': {
         'persistAuthorization': True,
@@ -88,14 +91,14 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "api.middleware.check_product_owner",
-    "api.middleware.check_user_seller",
-    "api.middleware.check_similar_user",
-    "api.middleware.check_user_buyer",
+    "api.middleware.authenticate_token",
+    "api.middleware.RoutePolicyMiddleware",
 ]
 
 ROOT_URLCONF = "vendingproject.urls"
 
+TEST_RUNNER = "vendingproject.test_runner.TestRunner"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -114,10 +117,133 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "vendingproject.wsgi.application"
 
+# Optional write-behind stock counters for a few very hot products, see
+# api/inventory.py. Only safe with a single worker process.
+HOT_INVENTORY = {
+    'ENABLED': False,
+    'PRODUCT_IDS': [],
+    'JOURNAL_PATH': BASE_DIR / 'hot_inventory.journal',
+    'FLUSH_BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 1.0,
+    'FSYNC': False,
+}
+
+# Audit log of every deposit change, see base/ledger.py. Deposits are still
+# updated in place on CustomUser, so enabling it adds an INSERT to each write.
+BALANCE_LEDGER = {
+    'ENABLED': False,
+}
+
+# Password hashing for sign-in and registration runs on at most WORKERS
+# threads, see api/hashing.py. Once MAX_PENDING hashes are running or queued,
+# further requests get a 503 with Retry-After: RETRY_AFTER seconds.
+PASSWORD_HASHING = {
+    'WORKERS': 2,
+    'MAX_PENDING': 8,
+    'RETRY_AFTER': 1,
+}
+
+# Active sessions are kept in the CACHE alias and counted in buckets of
+# BUCKET_SECONDS by expiry time, see api/sessions.py. A session is counted
+# until the end of its bucket.
+SESSION_REGISTRY = {
+    'CACHE': 'sessions',
+    'BUCKET_SECONDS': 900,
+}
+
+# JTIs of blacklisted refresh tokens are mirrored in a per-worker Bloom
+# filter, see api/blacklist.py, so a token that is not revoked is checked
+# without a query. It is sized for CAPACITY JTIs at FALSE_POSITIVE_RATE and
+# rebuilt twice as big when outgrown.
+TOKEN_BLACKLIST_FILTER = {
+    'CAPACITY': 100000,
+    'FALSE_POSITIVE_RATE': 0.001,
+}
+
+# Access tokens that passed verification are kept for reuse until they
+# expire, at most MAX_ENTRIES per worker, see api/tokencache.py.
+VERIFIED_TOKEN_CACHE = {
+    'MAX_ENTRIES': 10000,
+}
+
+# Caches backed by api.sharedcache.SharedMemoryCache are files mapped by
+# every worker process on the host, kept on a tmpfs when there is one, or in
+# VENDING_SHARED_CACHE_DIR when set. Their space is reserved when first
+# mapped: about 11 MB each for sessions and idempotency, 7 MB for default and
+# 4 MB for revocations, some 32 MB in all, which fits the 64 MB /dev/shm
+# Docker gives containers by default. Bigger deployments raise MAX_ENTRIES,
+# at about 220 bytes per entry for sessions, and give the cache directory
+# room to match (docker run --shm-size).
+#
+# The file names start with SHARED_CACHE_NAME, so two deployments on one host,
+# such as staging and production, never share idempotency keys or token
+# revocations. It defaults to one derived from the project directory; set
+# VENDING_SHARED_CACHE_NAME when deployments share a path, e.g. in
+# containers that mount the same tmpfs. Tests use files of their own, see
+# vendingproject/test_runner.py.
+SHARED_CACHE_DIR = Path(os.environ.get(
+    'VENDING_SHARED_CACHE_DIR',
+    '/dev/shm' if Path('/dev/shm').is_dir() else tempfile.gettempdir(),
+))
+SHARED_CACHE_NAME = os.environ.get(
+    'VENDING_SHARED_CACHE_NAME',
+    'vending-' + hashlib.sha1(str(BASE_DIR).encode()).hexdigest()[:8],
+)
+
 CACHES = {
     'default': {
+        'BACKEND': 'api.sharedcache.SharedMemoryCache',
+        'LOCATION': str(SHARED_CACHE_DIR / f'{SHARED_CACHE_NAME}-default.cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'ITEM_SIZE': 512,
+        },
+    },
+    # Token revocation cutoffs and the blacklist version, see api/tokens.py
+    # and api/blacklist.py. Losing an entry would make revoked tokens valid
+    # again, so this cache never evicts: it refuses new keys when full.
+    'revocations': {
+        'BACKEND': 'api.sharedcache.SharedMemoryCache',
+        'LOCATION': str(SHARED_CACHE_DIR / f'{SHARED_CACHE_NAME}-revocations.cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'ITEM_SIZE': 128,
+            'EVICT': False,
+        },
+    },
+    # Rendered catalog JSON, see api/catalog.py. Too large for a shared
+    # slot, so each worker keeps its own; the version key is shared.
+    'catalog': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'catalog',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10,
+        },
+    },
+    # Stored responses for Idempotency-Key replays, see api/idempotency.py.
+    # Larger responses, such as checkouts of a few dozen lines, are kept as a
+    # record without the body that refuses retries rather than replaying them.
+    # Past MAX_ENTRIES the least recently used keys go before their TIMEOUT.
+    'idempotency': {
+        'BACKEND': 'api.sharedcache.SharedMemoryCache',
+        'LOCATION': str(SHARED_CACHE_DIR / f'{SHARED_CACHE_NAME}-idempotency.cache'),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+            'ITEM_SIZE': 4096,
+        },
+    },
+    # One key per refresh token, see api/sessions.py. Eviction would lose
+    # sessions, so this needs room for every live token; raise MAX_ENTRIES
+    # when more than that many sign-ins happen within REFRESH_TOKEN_LIFETIME.
+    'sessions': {
+        'BACKEND': 'api.sharedcache.SharedMemoryCache',
+        'LOCATION': str(SHARED_CACHE_DIR / f'{SHARED_CACHE_NAME}-sessions.cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'ITEM_SIZE': 128,
+        },
+    },
 }
 
 # Database
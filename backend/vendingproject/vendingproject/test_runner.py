@@ -0,0 +1,28 @@
+import shutil
+import tempfile
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from api.sharedcache import relocate
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with the shared memory caches in files of their own,
+    deleted afterwards, so a test run never reads or clears the caches of a
+    server on the same host.
+    """
+
+    # Plenty for the tests, and small enough for a 64 MB /dev/shm.
+    max_cache_entries = 1000
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='vending-test-', dir=settings.SHARED_CACHE_DIR)
+        self.cache_settings = override_settings(CACHES=relocate(settings.CACHES, self.cache_dir, self.max_cache_entries))
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)